@@ -5,11 +5,108 @@ RSVP Experiment Launcher with Environment Selection
 
 Advanced launcher that allows you to select between Hospital and Lab environments
 with appropriate hardware configurations.
+
+The experiment modules (PsychoPy, pandas, hardware libraries) are imported
+only once an environment is chosen. --profile-startup reports the import
+time per module and the time of every startup phase.
 """
 
 import sys
 import os
-from rsvp_experiment import RSVPExperiment
+import time
+import builtins
+
+class StartupProfiler:
+    """Import time per module and duration of every startup phase
+    
+    Installs a timing wrapper around __import__: the first import of each
+    module is timed, and the time of the imports it triggers is subtracted,
+    so the report shows the module's own (self) time. Submodules loaded by
+    'from package import submodule' are timed as well.
+    """
+    
+    # Phases that wait for the operator; reported, but not part of the total
+    INTERACTIVE_PHASES = ('requirements_check',)
+    
+    def __init__(self, budget=None):
+        self.budget = budget  # Startup budget in seconds (None = no budget)
+        self.modules = {}  # Module name -> self time (seconds)
+        self.phases = {}  # Phase name -> duration (seconds)
+        self.nested = []  # Time of nested imports, per import being timed
+        self.original_import = None
+    
+    def install(self):
+        """Start timing imports"""
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.timed_import
+    
+    def uninstall(self):
+        """Stop timing imports"""
+        if self.original_import:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+    
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level:
+            return self.original_import(name, globals, locals, fromlist, level)
+        
+        # A loaded package can still load submodules through the fromlist
+        new_module = name not in sys.modules
+        submodules = [f"{name}.{entry}" for entry in fromlist or ()
+                      if entry != '*' and f"{name}.{entry}" not in sys.modules]
+        if not new_module and not submodules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        
+        start_time = time.perf_counter()
+        self.nested.append(0.0)
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            nested = self.nested.pop()
+            loaded = [submodule for submodule in submodules if submodule in sys.modules]
+            if new_module or loaded:
+                module = loaded[0] if not new_module and len(loaded) == 1 else name
+                self.modules[module] = self.modules.get(module, 0.0) + elapsed - nested
+                if self.nested:
+                    self.nested[-1] += elapsed
+            elif self.nested:
+                # Only attributes were imported: the caller keeps this time
+                self.nested[-1] += nested
+    
+    def phase(self, name, start_time):
+        """Record a phase that started at start_time (time.perf_counter)"""
+        self.phases[name] = time.perf_counter() - start_time
+    
+    def report(self, startup_times=None, top=15):
+        """Print import time per package and the duration of every phase"""
+        packages = {}
+        for name, elapsed in self.modules.items():
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0.0) + elapsed
+        
+        print()
+        print("Startup profile")
+        print("=" * 45)
+        print(f"Imports ({len(self.modules)} modules, {sum(packages.values())*1000:.0f} ms):")
+        for package, elapsed in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {package:<28} {elapsed*1000:8.1f} ms")
+        
+        phases = dict(self.phases)
+        phases.update(startup_times or {})
+        print("Phases:")
+        for phase, elapsed in phases.items():
+            note = " (not in total)" if phase in self.INTERACTIVE_PHASES else ""
+            print(f"  {phase:<28} {elapsed*1000:8.1f} ms{note}")
+        
+        # Launcher phases before the experiment plus the experiment's own startup
+        total = sum(elapsed for phase, elapsed in self.phases.items()
+                    if phase not in self.INTERACTIVE_PHASES)
+        total += (startup_times or {}).get('total_startup', 0.0)
+        print(f"Total startup: {total*1000:.0f} ms")
+        if self.budget is not None:
+            status = "within" if total <= self.budget else "OVER"
+            print(f"Startup budget: {self.budget*1000:.0f} ms ({status} budget)")
 
 def display_environment_info():
     """Display information about the two environments"""
@@ -60,42 +157,32 @@ def select_environment():
             print("Invalid choice. Please select 0-3.")
             print()
 
-def check_environment_requirements(environment):
-    """Check if environment requirements are met"""
+def check_environment_requirements(environment, hardware):
+    """Check if environment requirements are met
+    
+    hardware is a HardwareSession: the devices probed here stay initialized
+    and are handed to the experiment.
+    """
     print(f"Checking {environment} environment requirements...")
     
     if environment == 'hospital':
         # Check for gamepad
-        try:
-            from rsvp_hardware import GamepadController
-            gamepad = GamepadController()
-            if gamepad.initialize():
-                print(f"✅ Gamepad detected: {gamepad.gamepad_name}")
-                gamepad.cleanup()
-            else:
-                print("⚠️  No gamepad detected - Hospital environment may not work properly")
-                response = input("Continue anyway? (y/n): ").lower()
-                if response != 'y':
-                    return False
-        except ImportError:
-            print("❌ Gamepad support not available (pygame missing)")
-            return False
+        gamepad = hardware.probe_gamepad()
+        if gamepad:
+            print(f"✅ Gamepad detected: {gamepad.gamepad_name}")
+        else:
+            print("⚠️  No gamepad detected - Hospital environment may not work properly")
+            response = input("Continue anyway? (y/n): ").lower()
+            if response != 'y':
+                return False
         
         # Check for DAQ
-        try:
-            from rsvp_hardware import PulseGenerator
-            pulse_gen = PulseGenerator()
-            if pulse_gen.initialize():
-                print("✅ DAQ device detected")
-                pulse_gen.cleanup()
-            else:
-                print("⚠️  No DAQ device detected - EEG pulses will not work")
-                response = input("Continue anyway? (y/n): ").lower()
-                if response != 'y':
-                    return False
-        except ImportError:
-            print("⚠️  DAQ support not available (nidaqmx missing)")
-            response = input("Continue without pulses? (y/n): ").lower()
+        pulse_gen = hardware.probe_pulse_gen()
+        if pulse_gen:
+            print(f"✅ Trigger output ready ({pulse_gen.backend.name})")
+        else:
+            print("⚠️  No DAQ device detected - EEG pulses will not work")
+            response = input("Continue anyway? (y/n): ").lower()
             if response != 'y':
                 return False
     
@@ -104,14 +191,9 @@ def check_environment_requirements(environment):
     
     return True
 
-def run_with_environment(environment):
+def run_with_environment(environment, profiler=None):
     """Run the experiment with specified environment"""
     
-    # Check requirements
-    if not check_environment_requirements(environment):
-        print("Environment requirements not met.")
-        return False
-    
     # Load appropriate config
     config_files = {
         'hospital': 'rsvp_config_hospital.json',
@@ -126,15 +208,45 @@ def run_with_environment(environment):
         print("Please ensure the configuration files are present.")
         return False
     
+    hardware = None
     try:
-        print(f"\nStarting RSVP experiment in {environment.upper()} mode...")
-        print("=" * 50)
+        # PsychoPy, pandas and the experiment modules load here, not at launcher startup
+        phase_start = time.perf_counter()
+        from rsvp_experiment import RSVPExperiment
+        from rsvp_hardware import HardwareSession
+        if profiler:
+            profiler.phase('import_experiment', phase_start)
         
-        # Create and run experiment with environment pre-configured
+        # Create experiment with environment pre-configured
+        phase_start = time.perf_counter()
         experiment = RSVPExperiment(config_file)
+        if profiler:
+            profiler.phase('experiment_init', phase_start)
+        
+        # Check requirements; the devices probed here are the ones the experiment uses
+        phase_start = time.perf_counter()
+        hardware = HardwareSession(experiment.config)
+        if not check_environment_requirements(environment, hardware):
+            print("Environment requirements not met.")
+            hardware.close()
+            return False
+        experiment.hardware_session = hardware
+        if profiler:
+            profiler.phase('requirements_check', phase_start)
         
-        # Run experiment with environment parameter (patient-friendly)
-        success = experiment.run_experiment(environment=environment)
+        print(f"\nStarting RSVP experiment in {environment.upper()} mode...")
+        print("=" * 50)
+        
+        # Run experiment with environment parameter (patient-friendly). The
+        # startup profile is reported as soon as the experiment is ready to
+        # run its first sequence, or on the way out if startup did not finish
+        if profiler:
+            experiment.on_startup_complete = profiler.report
+        try:
+            success = experiment.run_experiment(environment=environment)
+        finally:
+            if profiler and 'total_startup' not in experiment.startup_times:
+                profiler.report(experiment.startup_times)
         
         if success:
             print(f"\n🎉 Experiment completed successfully in {environment.upper()} mode!")
@@ -150,8 +262,11 @@ def run_with_environment(environment):
     except Exception as e:
         print(f"\nError running experiment in {environment.upper()} mode: {e}")
         return False
+    finally:
+        if hardware:
+            hardware.close()
 
-def main():
+def main(profiler=None):
     """Main launcher function"""
     print("RSVP Experiment Launcher")
     print("=" * 30)
@@ -170,7 +285,7 @@ def main():
         return
     
     # Run experiment
-    success = run_with_environment(environment)
+    success = run_with_environment(environment, profiler)
     
     # Final message
     if success:
@@ -180,28 +295,41 @@ def main():
     
     input("\nPress Enter to exit...")
 
-def quick_hospital():
+def quick_hospital(profiler=None):
     """Quick launcher for hospital environment"""
     print("Quick Hospital Environment Launch")
     print("=" * 35)
-    return run_with_environment('hospital')
+    return run_with_environment('hospital', profiler)
 
-def quick_lab():
+def quick_lab(profiler=None):
     """Quick launcher for lab environment"""
     print("Quick Lab Environment Launch")
     print("=" * 30)
-    return run_with_environment('lab')
+    return run_with_environment('lab', profiler)
 
 if __name__ == "__main__":
+    # Options: --profile-startup, --startup-budget=SECONDS
+    options = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    profiler = None
+    if '--profile-startup' in options:
+        budget = None
+        for option in options:
+            if option.startswith('--startup-budget='):
+                budget = float(option.split('=', 1)[1])
+        profiler = StartupProfiler(budget)
+        profiler.install()
+    
     # Check for command line arguments for quick launch
-    if len(sys.argv) > 1:
-        arg = sys.argv[1].lower()
+    if args:
+        arg = args[0].lower()
         if arg == 'hospital' or arg == 'h':
-            quick_hospital()
+            quick_hospital(profiler)
         elif arg == 'lab' or arg == 'l':
-            quick_lab()
+            quick_lab(profiler)
         else:
             print(f"Unknown argument: {arg}")
-            print("Usage: python launch_rsvp.py [hospital|lab]")
+            print("Usage: python launch_rsvp.py [hospital|lab] [--profile-startup] [--startup-budget=SECONDS]")
     else:
-        main()
+        main(profiler)
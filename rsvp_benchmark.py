@@ -0,0 +1,272 @@
+"""
+RSVP Display Benchmark
+======================
+
+This module measures the display timing of the machine before a session:
+- Thousands of flips under idle, image-drawing and RSVP load scenarios,
+  drawn with neutral noise textures (no experimental stimulus is shown)
+- Frame interval distribution (p50/p95/p99/max), dropped-frame rate and
+  whether the flips are locked to the vertical blank
+- Comparison against a stored baseline of the same machine, flagging regressions
+
+The report of a session is saved next to its data
+(<session>_display_benchmark.json); the baseline of each machine is kept
+as display_baseline_<hostname>.json.
+
+Usage:
+    python rsvp_benchmark.py [config_file] [--flips=N] [--save-baseline]
+
+Dependencies:
+- numpy
+- psychopy
+"""
+
+import gc
+import os
+import sys
+import json
+import socket
+import numpy as np
+from datetime import datetime
+from rsvp_timing import frames_for
+
+# Worse than the baseline by more than this is a regression
+REGRESSION_TOLERANCE = {
+    'p99': 0.001,           # seconds
+    'dropped_rate': 0.005,  # fraction of flips
+    'refresh_rate': 1.0     # Hz
+}
+
+class DisplayBenchmark:
+    """Frame interval statistics of a window under several drawing loads
+    
+    Each scenario is a callable drawing one frame (and polling input, like
+    the experiment does between flips), or None for idle flips. Frame
+    intervals come from window.recordFrameIntervals, as in FrameTimingLog.
+    """
+    
+    def __init__(self, window, ifi=None, n_flips=2000, drop_threshold=1.5):
+        self.window = window
+        self.ifi = ifi
+        self.n_flips = n_flips
+        self.drop_threshold = drop_threshold
+        self.report = {}
+    
+    def measure(self, frame=None):
+        """Flip n_flips times, calling frame(i) before each flip, returns the intervals"""
+        # Settle on the display before recording
+        for i in range(10):
+            self.window.flip()
+        
+        self.window.frameIntervals = []
+        self.window.recordFrameIntervals = True
+        for i in range(self.n_flips):
+            if frame is not None:
+                frame(i)
+            self.window.flip()
+        self.window.recordFrameIntervals = False
+        
+        return np.asarray(self.window.frameIntervals, dtype=float)
+    
+    def summarize(self, intervals):
+        """Interval percentiles, dropped frames and vsync lock of one scenario"""
+        median_interval = float(np.median(intervals))
+        frame = self.ifi or median_interval
+        
+        dropped = int(np.sum(intervals > self.drop_threshold * frame))
+        
+        # Locked to vsync: intervals run at the frame period and (dropped
+        # frames included) are whole numbers of frames, not in between
+        multiples = intervals / frame
+        on_vsync = np.abs(multiples - np.maximum(np.round(multiples), 1)) < 0.1
+        vsync_locked = bool(abs(median_interval - frame) < 0.05 * frame and on_vsync.mean() >= 0.95)
+        
+        return {
+            'n_flips': int(intervals.size),
+            'mean': float(intervals.mean()),
+            'std': float(intervals.std()),
+            'p50': median_interval,
+            'p95': float(np.percentile(intervals, 95)),
+            'p99': float(np.percentile(intervals, 99)),
+            'max': float(intervals.max()),
+            'refresh_rate': 1.0 / median_interval,
+            'dropped_frames': dropped,
+            'dropped_rate': dropped / intervals.size,
+            'vsync_locked': vsync_locked
+        }
+    
+    def run(self, scenarios, no_gc=()):
+        """Measure every scenario ({name: frame callable or None}), returns the report
+        
+        Scenarios named in no_gc run with garbage collection disabled, as
+        fast RSVP sequences do.
+        """
+        results = {}
+        for name, frame in scenarios.items():
+            print(f"Display benchmark: {name} ({self.n_flips} flips)...")
+            if name in no_gc:
+                gc.disable()
+            try:
+                intervals = self.measure(frame)
+            finally:
+                gc.enable()
+            results[name] = self.summarize(intervals)
+            print_benchmark_summary(name, results[name])
+        
+        self.report = {
+            'host': socket.gethostname(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'window': {
+                'size': [int(value) for value in self.window.size],
+                'fullscreen': bool(getattr(self.window, 'fullscr', False)),
+                'ifi': self.ifi
+            },
+            'scenarios': results
+        }
+        return self.report
+
+def neutral_scenarios(window, image_size, isi, ifi, n_textures=4, seed=0):
+    """Idle, image and RSVP scenarios drawn with neutral noise textures
+    
+    The benchmark runs before the instructions, with the participant
+    possibly watching, so none of the experimental images is shown and no
+    input is read (no response is consumed). The RSVP scenario changes
+    texture every `isi` (rounded to whole frames), as a sequence does.
+    """
+    from psychopy import visual
+    from PIL import Image
+    
+    # Low-contrast gray noise, one texture upload each, as TextureManager does
+    rng = np.random.default_rng(seed)
+    width, height = image_size
+    textures = [
+        visual.ImageStim(
+            win=window,
+            image=Image.fromarray(rng.integers(96, 160, (height, width, 3), dtype=np.uint8), 'RGB'),
+            size=(width, height),
+            units='pix'
+        )
+        for i in range(n_textures)
+    ]
+    frames_per_image = frames_for(isi, ifi)
+    
+    def rsvp_frame(i):
+        textures[(i // frames_per_image) % n_textures].draw()
+    
+    return {
+        'idle': None,
+        'image': lambda i: textures[0].draw(),
+        'rsvp': rsvp_frame
+    }
+
+def baseline_path(baseline_dir='experiment_data', host=None):
+    """Baseline file of a machine (this one by default)"""
+    return os.path.join(baseline_dir, f"display_baseline_{host or socket.gethostname()}.json")
+
+def load_baseline(path):
+    """Stored benchmark report, or None if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_report(path, report):
+    """Write a benchmark report (or baseline) as JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+def compare_to_baseline(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Regressions of a report against the baseline, as a list of messages"""
+    regressions = []
+    for name, result in report['scenarios'].items():
+        reference = baseline['scenarios'].get(name)
+        if reference is None:
+            continue
+        if reference['vsync_locked'] and not result['vsync_locked']:
+            regressions.append(f"{name}: flips no longer locked to vsync")
+        if abs(result['refresh_rate'] - reference['refresh_rate']) > tolerance['refresh_rate']:
+            regressions.append(f"{name}: refresh rate {result['refresh_rate']:.1f} Hz "
+                               f"(baseline {reference['refresh_rate']:.1f} Hz)")
+        if result['p99'] > reference['p99'] + tolerance['p99']:
+            regressions.append(f"{name}: p99 interval {result['p99']*1000:.2f} ms "
+                               f"(baseline {reference['p99']*1000:.2f} ms)")
+        if result['dropped_rate'] > reference['dropped_rate'] + tolerance['dropped_rate']:
+            regressions.append(f"{name}: {result['dropped_rate']*100:.2f}% dropped frames "
+                               f"(baseline {reference['dropped_rate']*100:.2f}%)")
+    return regressions
+
+def check_against_baseline(report, baseline_dir='experiment_data', save_baseline=False):
+    """Compare a report with this machine's baseline and add the result to the report
+    
+    The first report of a machine (or any report with save_baseline)
+    becomes its baseline. Only reports of the same window size and mode are
+    compared. Returns the list of regressions.
+    """
+    path = baseline_path(baseline_dir, report['host'])
+    baseline = None if save_baseline else load_baseline(path)
+    
+    if baseline is None:
+        save_report(path, report)
+        print(f"Display baseline saved to {path}")
+        report['baseline'] = {'path': path, 'date': report['date'], 'compared': False, 'regressions': []}
+        return []
+    
+    window = (report['window']['size'], report['window']['fullscreen'])
+    if window != (baseline['window']['size'], baseline['window']['fullscreen']):
+        print(f"Display baseline {path} is for another window "
+              f"({baseline['window']['size']}, fullscreen {baseline['window']['fullscreen']}), not compared")
+        report['baseline'] = {'path': path, 'date': baseline['date'], 'compared': False, 'regressions': []}
+        return []
+    
+    regressions = compare_to_baseline(report, baseline)
+    report['baseline'] = {'path': path, 'date': baseline['date'], 'compared': True, 'regressions': regressions}
+    if regressions:
+        print(f"⚠️  Display timing regressions against the baseline of {baseline['date']}:")
+        for message in regressions:
+            print(f"  - {message}")
+    else:
+        print(f"Display timing matches the baseline of {baseline['date']}")
+    return regressions
+
+def print_benchmark_summary(name, summary):
+    """Print the frame interval distribution of a scenario"""
+    print(f"  {name}: p50/p95/p99/max {summary['p50']*1000:.2f} / {summary['p95']*1000:.2f} / "
+          f"{summary['p99']*1000:.2f} / {summary['max']*1000:.2f} ms, "
+          f"dropped {summary['dropped_frames']} ({summary['dropped_rate']*100:.2f}%), "
+          f"vsync {'locked' if summary['vsync_locked'] else 'NOT locked'}")
+
+def run_benchmark_standalone(config_file=None, n_flips=2000, save_baseline=False):
+    """Benchmark this machine with the experiment's window and hardware"""
+    from rsvp_experiment import RSVPExperiment
+    from rsvp_timing import session_clock
+    
+    session_clock.anchor()
+    experiment = RSVPExperiment(config_file)
+    try:
+        experiment.setup_window()
+        experiment.config['benchmark_flips'] = n_flips
+        report = experiment.run_display_benchmark(save_baseline=save_baseline)
+        
+        filename = os.path.join('experiment_data', f"display_benchmark_{report['host']}_"
+                                f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        save_report(filename, report)
+        print(f"Benchmark report saved to {filename}")
+    finally:
+        if experiment.window:
+            experiment.window.close()
+        if experiment.hardware:
+            from rsvp_hardware import cleanup_hardware
+            cleanup_hardware(experiment.hardware)
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+    n_flips = 2000
+    for argument in sys.argv[1:]:
+        if argument.startswith('--flips='):
+            n_flips = int(argument.split('=', 1)[1])
+    run_benchmark_standalone(arguments[0] if arguments else None, n_flips,
+                             save_baseline='--save-baseline' in sys.argv)
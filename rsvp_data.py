@@ -0,0 +1,509 @@
+"""
+RSVP Data Module
+================
+
+This module keeps the data of a session safe while it runs:
+- EventLog: append-only, line-framed event log (one JSON record per line)
+  written by a background thread with periodic fsync, so the render thread
+  never touches a file and a crash loses at most the last fsync interval
+- Finalization: an index (record counts, byte offsets per record type and
+  per sequence) written next to the log when the session is saved
+- read_event_log: reads a log back, ignoring a record cut short by a crash
+- Online response statistics: accuracy and reaction time mean/variance
+  (Welford) and median (P-square estimate) updated on every response
+- Columnar session file (Parquet): typed tables of stimulus events,
+  responses, pulses and frame intervals plus the session metadata, in one
+  file that loads with a single read (load_session)
+
+Dependencies:
+- numpy
+- pandas, pyarrow (optional, for the columnar session file)
+"""
+
+import os
+import json
+import math
+import bisect
+import queue
+import threading
+import time
+import numpy as np
+
+# Optional Arrow/Parquet support (None until load_arrow is called)
+ARROW_AVAILABLE = None
+pa = pq = None
+
+def load_arrow():
+    """Import pyarrow once (only when a columnar file is written or read), returns True if available"""
+    global ARROW_AVAILABLE, pa, pq
+    if ARROW_AVAILABLE is None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            ARROW_AVAILABLE = True
+        except ImportError:
+            ARROW_AVAILABLE = False
+    return ARROW_AVAILABLE
+
+def json_default(value):
+    """Encode NumPy scalars/arrays and other stray values in records"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+class EventLog:
+    """Append-only event log written by a background thread
+    
+    write() only puts the record in a queue (never dropped, never blocking);
+    the writer thread encodes records as JSON lines, flushes after every
+    batch and calls os.fsync at most every fsync_interval seconds.
+    """
+    
+    def __init__(self, path, fsync_interval=1.0, clock=None):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.clock = clock
+        self.queue = queue.Queue()
+        self.n_records = 0
+        self.n_fsyncs = 0
+        self.errors = 0
+        self.file = None
+        self.thread = None
+        self.index = None
+    
+    def start(self):
+        """Open the log file and start the writer thread"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'ab')
+        self.thread = threading.Thread(target=self._run, name='EventLog', daemon=True)
+        self.thread.start()
+        print(f"Event log: {self.path}")
+    
+    def write(self, kind, **fields):
+        """Queue a record (no file I/O on the calling thread)"""
+        if self.thread is None:
+            return
+        fields['type'] = kind
+        if self.clock is not None:
+            fields.setdefault('t', self.clock.now())
+        self.queue.put(fields)
+    
+    def close(self, timeout=5.0):
+        """Write the records still queued, fsync and close the file
+        
+        Returns False if the writer thread did not finish within timeout
+        (records still queued may be missing from the file).
+        """
+        if self.thread is None:
+            return True
+        self.queue.put(None)
+        self.thread.join(timeout)
+        finished = not self.thread.is_alive()
+        if not finished:
+            print(f"Warning: event log writer did not finish within {timeout:.1f} s, "
+                  f"{self.queue.qsize()} records not written")
+        self.thread = None
+        return finished
+    
+    def finalize(self, complete=True):
+        """Close the log and write its index (<log>.index.json), returns the index
+        
+        The index is marked incomplete if the session did not finish
+        (complete=False), the writer thread did not finish or the last
+        record is cut short.
+        """
+        finished = self.close()
+        self.index = index_event_log(self.path)
+        self.index['complete'] = self.index['complete'] and complete and finished
+        with open(index_path(self.path), 'w') as f:
+            json.dump(self.index, f, indent=2)
+        print(f"Event log finalized: {self.index['n_records']} records, index {index_path(self.path)}")
+        return self.index
+    
+    def _run(self):
+        """Writer loop: batches of records, flush per batch, periodic fsync"""
+        last_fsync = time.monotonic()
+        unsynced = False
+        running = True
+        
+        while running:
+            try:
+                batch = [self.queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            lines = []
+            for record in batch:
+                if record is None:
+                    running = False
+                    continue
+                record['seq'] = self.n_records
+                try:
+                    lines.append(json.dumps(record, default=json_default).encode('utf-8') + b'\n')
+                    self.n_records += 1
+                except (TypeError, ValueError):
+                    self.errors += 1
+            
+            if lines:
+                self.file.write(b''.join(lines))
+                self.file.flush()
+                unsynced = True
+            if unsynced and (not running or time.monotonic() - last_fsync >= self.fsync_interval):
+                os.fsync(self.file.fileno())
+                self.n_fsyncs += 1
+                unsynced = False
+                last_fsync = time.monotonic()
+        
+        self.file.close()
+    
+    def stats(self):
+        """Records written, fsyncs and records that could not be encoded"""
+        return {'path': self.path, 'n_records': self.n_records, 'n_fsyncs': self.n_fsyncs, 'errors': self.errors}
+
+def index_path(log_path):
+    """Path of the index written next to an event log"""
+    return f"{os.path.splitext(log_path)[0]}.index.json"
+
+def index_event_log(path):
+    """Record counts and byte offsets per record type and per sequence"""
+    counts = {}
+    offsets = {}
+    sequences = {}
+    n_records = 0
+    complete = True
+    
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Record cut short by a crash (only possible at the end)
+                complete = False
+                break
+            kind = record.get('type')
+            counts[kind] = counts.get(kind, 0) + 1
+            offsets.setdefault(kind, []).append(offset)
+            if kind == 'sequence_start':
+                sequences[str(record.get('sequence'))] = offset
+            n_records += 1
+            offset += len(line)
+    
+    return {
+        'log': os.path.basename(path),
+        'n_records': n_records,
+        'size': offset,
+        'complete': complete,
+        'counts': counts,
+        'sequences': sequences,
+        'offsets': offsets
+    }
+
+def read_event_log(path, kinds=None):
+    """Records of an event log (optionally only the given types), skipping a truncated last line"""
+    records = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if kinds is None or record.get('type') in kinds:
+                records.append(record)
+    return records
+
+class P2Quantile:
+    """Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac)
+    
+    Five markers track the minimum, the p/2, p and (1+p)/2 quantiles and the
+    maximum; each update is O(1) and no observation is stored after the first
+    five (which give the exact quantile).
+    """
+    
+    def __init__(self, p=0.5):
+        self.p = p
+        self.n = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+    
+    def update(self, x):
+        """Add one observation"""
+        self.n += 1
+        q = self.heights
+        if self.n <= 5:
+            bisect.insort(q, x)
+            return
+        
+        # Cell of the observation (extreme markers follow the minimum and maximum)
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                s = 1 if d > 0 else -1
+                height = self._parabolic(i, s)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + s * (q[i + s] - q[i]) / (positions[i + s] - positions[i])
+                q[i] = height
+                positions[i] += s
+    
+    def _parabolic(self, i, s):
+        """Piecewise-parabolic prediction of marker i moved by s"""
+        q = self.heights
+        n = self.positions
+        return q[i] + s / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+    
+    def value(self):
+        """Current quantile estimate (None before the first observation)"""
+        if self.n == 0:
+            return None
+        if self.n <= 5:
+            # Exact, interpolated as numpy.percentile
+            position = self.p * (self.n - 1)
+            lower = int(position)
+            upper = min(lower + 1, self.n - 1)
+            return self.heights[lower] + (position - lower) * (self.heights[upper] - self.heights[lower])
+        return self.heights[2]
+
+class OnlineStats:
+    """Running count, mean and variance (Welford), min, max and median (P-square)"""
+    
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.median_estimate = P2Quantile(0.5)
+    
+    def update(self, x):
+        """Add one observation, O(1)"""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.median_estimate.update(x)
+    
+    @property
+    def variance(self):
+        """Sample variance (None below two observations)"""
+        return self.m2 / (self.n - 1) if self.n > 1 else None
+    
+    @property
+    def std(self):
+        """Sample standard deviation (None below two observations)"""
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+    
+    @property
+    def median(self):
+        return self.median_estimate.value()
+
+class ResponseStats:
+    """Session summary updated on every response (no DataFrame, O(1) per response and per summary)"""
+    
+    def __init__(self):
+        self.total = 0
+        self.correct = 0
+        self.reaction_times = OnlineStats()
+    
+    def update(self, reaction_time, correct):
+        """Add one response"""
+        self.total += 1
+        if correct:
+            self.correct += 1
+        self.reaction_times.update(reaction_time)
+    
+    def summary(self):
+        """Summary statistics of the responses so far (empty before the first response)"""
+        if self.total == 0:
+            return {}
+        
+        return {
+            'total_responses': self.total,
+            'correct_responses': self.correct,
+            'accuracy': self.correct / self.total * 100,
+            'mean_reaction_time': self.reaction_times.mean,
+            'median_reaction_time': self.reaction_times.median,
+            'std_reaction_time': self.reaction_times.std
+        }
+
+# Columnar session file: every table in one Parquet file, rows tagged with
+# their table; session metadata is stored as JSON in the file metadata
+SESSION_SCHEMA_VERSION = 1
+SESSION_METADATA_KEY = b'rsvp_session'
+
+SESSION_COLUMNS = [
+    ('table', 'string'),
+    ('sequence', 'int32'),
+    ('index', 'int32'),
+    ('label', 'string'),
+    # Stimulus events (compiled timeline and achieved timing)
+    ('event_type', 'int8'),
+    ('stim_id', 'int32'),
+    ('image_name', 'string'),
+    ('lines', 'int8'),
+    ('pulse_code', 'int16'),
+    ('onset', 'float64'),
+    ('planned_frames', 'int32'),
+    ('planned_duration', 'float64'),
+    ('achieved_frames', 'int32'),
+    ('achieved_duration', 'float64'),
+    ('error', 'float64'),
+    # Responses
+    ('image_position', 'int32'),
+    ('reaction_time', 'float64'),
+    ('response_time', 'float64'),
+    ('correct', 'bool'),
+    ('timestamp', 'string'),
+    # Pulses (worker and flip-locked)
+    ('value', 'int32'),
+    ('queued', 'float64'),
+    ('scheduled', 'float64'),
+    ('on', 'float64'),
+    ('off', 'float64'),
+    ('latency', 'float64'),
+    ('flip_time', 'float64'),
+    ('delay', 'float64'),
+    # Frame intervals
+    ('interval', 'float64')
+]
+
+SESSION_TABLES = {
+    'events': ['sequence', 'index', 'label', 'event_type', 'stim_id', 'image_name', 'lines', 'pulse_code',
+               'onset', 'planned_frames', 'planned_duration', 'achieved_frames', 'achieved_duration', 'error'],
+    'responses': ['sequence', 'index', 'image_position', 'reaction_time', 'response_time', 'correct', 'timestamp'],
+    'pulses': ['index', 'label', 'value', 'queued', 'scheduled', 'on', 'off', 'latency', 'flip_time', 'delay'],
+    'frame_intervals': ['sequence', 'index', 'interval']
+}
+
+def session_schema():
+    """Arrow schema of the columnar session file"""
+    return pa.schema([(name, pa.type_for_alias(dtype)) for name, dtype in SESSION_COLUMNS],
+                     metadata={b'rsvp_schema_version': str(SESSION_SCHEMA_VERSION).encode()})
+
+def event_rows(sequence_timing, timelines, image_names):
+    """One row per presented event: compiled timeline joined with the achieved timing"""
+    rows = []
+    for entry in sequence_timing:
+        sequence = entry['sequence_number']
+        timeline = timelines.get(sequence)
+        if timeline is not None and len(timeline) != len(entry['stimuli']):
+            timeline = None
+        
+        for i, stimulus in enumerate(entry['stimuli']):
+            row = {'table': 'events', 'sequence': sequence, 'index': i}
+            row.update(stimulus)
+            if timeline is not None:
+                event = timeline[i]
+                stim_id = int(event['stim_id'])
+                row.update(event_type=int(event['event_type']), stim_id=stim_id, lines=int(event['lines']),
+                           pulse_code=int(event['pulse_code']))
+                if 0 <= stim_id < len(image_names):
+                    row['image_name'] = image_names[stim_id]
+            rows.append(row)
+    return rows
+
+def response_rows(responses):
+    """One row per response"""
+    return [{'table': 'responses', 'sequence': response['sequence_number'], 'index': i,
+             'image_position': response['image_position'], 'reaction_time': response['reaction_time'],
+             'response_time': response.get('response_time'), 'correct': bool(response['correct']),
+             'timestamp': response.get('timestamp')}
+            for i, response in enumerate(responses)]
+
+def pulse_rows(pulses, flip_pulses):
+    """One row per pulse (worker pulses, then flip-locked pulses labelled with their event)"""
+    rows = [dict(pulse, table='pulses', index=i, label='worker') for i, pulse in enumerate(pulses)]
+    rows += [{'table': 'pulses', 'index': len(pulses) + i, 'label': pulse['event'], 'value': pulse['value'],
+              'on': pulse['on'], 'off': pulse.get('off'), 'flip_time': pulse['flip_time'],
+              'delay': pulse['delay']}
+             for i, pulse in enumerate(flip_pulses)]
+    return rows
+
+def write_session_table(path, metadata, sequence_timing, timelines, image_names, responses,
+                        pulses, flip_pulses, frame_intervals):
+    """Write every table of a session into one Parquet file, returns the number of rows"""
+    import pandas as pd
+    if not load_arrow():
+        raise ImportError("pyarrow is required for the columnar session file")
+    
+    frames = [pd.DataFrame(event_rows(sequence_timing, timelines, image_names)),
+              pd.DataFrame(response_rows(responses)),
+              pd.DataFrame(pulse_rows(pulses, flip_pulses))]
+    for sequence, intervals in frame_intervals.items():
+        frames.append(pd.DataFrame({'table': 'frame_intervals', 'sequence': sequence,
+                                    'index': np.arange(len(intervals)), 'interval': intervals}))
+    
+    # Every column of the schema, in schema order, missing values as nulls
+    # (a run aborted before its first event has no rows at all)
+    columns = [name for name, _ in SESSION_COLUMNS]
+    frames = [frame for frame in frames if len(frame)] or [pd.DataFrame(columns=columns)]
+    df = pd.concat(frames, ignore_index=True).reindex(columns=columns)
+    for name, dtype in SESSION_COLUMNS:
+        if dtype.startswith('int'):
+            df[name] = df[name].astype('Int64')
+        elif dtype == 'bool':
+            df[name] = df[name].astype('boolean')
+    
+    schema = session_schema()
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **schema.metadata,
+        SESSION_METADATA_KEY: json.dumps(metadata, default=json_default).encode('utf-8')
+    })
+    pq.write_table(table, path)
+    return table.num_rows
+
+def load_session(path):
+    """Load a columnar session file with a single read
+    
+    Returns a dict with the session 'metadata' and one pandas DataFrame per
+    table ('events', 'responses', 'pulses', 'frame_intervals'). Integer and
+    boolean columns keep their type (pandas nullable dtypes).
+    """
+    import pandas as pd
+    if not load_arrow():
+        raise ImportError("pyarrow is required to load a columnar session file")
+    
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[SESSION_METADATA_KEY])
+    nullable_types = {
+        pa.int8(): pd.Int8Dtype(),
+        pa.int16(): pd.Int16Dtype(),
+        pa.int32(): pd.Int32Dtype(),
+        pa.bool_(): pd.BooleanDtype()
+    }
+    df = table.to_pandas(types_mapper=nullable_types.get)
+    
+    session = {'metadata': metadata}
+    for name, columns in SESSION_TABLES.items():
+        session[name] = df.loc[df['table'] == name, columns].reset_index(drop=True)
+    return session
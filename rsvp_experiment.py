@@ -18,18 +18,27 @@ Key features:
 - Comprehensive data logging
 """
 
-from psychopy import visual, core, event, data, gui, clock, monitors
-import pandas as pd
+from psychopy import visual, core, event
 import numpy as np
 import json
 import os
 import random
-import glob
 from datetime import datetime
 from pathlib import Path
 import time
+import gc
 import threading
-from rsvp_hardware import create_hardware_manager, cleanup_hardware, ScreeningTools
+from concurrent.futures import ThreadPoolExecutor
+from rsvp_hardware import create_hardware_manager, cleanup_hardware, ScreeningTools, PulseWorker, PULSE_CODES
+from rsvp_timing import (session_clock, FrameScheduler, FrameTimingLog, compile_sequence_timeline, event_label,
+                         frame_multiple_errors, frame_count_mismatches,
+                         event_texture_key, EVENT_IMAGE, EVENT_LINES_CHANGE, print_timing_report,
+                         print_frame_summary, print_flip_pulse_delays)
+from rsvp_telemetry import TelemetryPublisher
+from rsvp_data import EventLog, ResponseStats, OnlineStats, write_session_table, load_arrow
+from rsvp_benchmark import DisplayBenchmark, neutral_scenarios, check_against_baseline, save_report
+from rsvp_stimuli import (StimulusLoader, StimulusCache, StimulusBundle, TextureManager,
+                          find_image_files, is_stimulus_bundle, build_load_report, print_load_report)
 
 class RSVPExperiment:
     """Main RSVP Experiment class"""
@@ -42,18 +51,56 @@ class RSVPExperiment:
             'withpulses': False,  # DAQ pulse generation
             'language': 'english',  # 'english', 'spanish', 'french'
             'device_response': 'keyboard',  # 'keyboard' or 'gamepad'
-            'pictures_path': 'RSVP_HClinic/000rsvpscr_pic',
+            'keyboard_backend': 'psychopy',  # 'psychopy' (timestamped key presses) or 'event' (event.getKeys)
+            'gamepad_sample_rate': 1000,  # Maximum gamepad sampling rate in Hz (0 = read buttons without the sampler)
+            'pictures_path': 'RSVP_HClinic/000rsvpscr_pic',  # Pictures directory or stimulus bundle
             'window_resolution': [1024, 768],
             'fullscreen': False,
             'isi': [1.0],  # Inter-stimulus interval in seconds
+            'mixed_isi': False,  # Draw the ISI of every image from 'isi' (instead of one per sequence)
+            'fast_rsvp': False,  # ISIs down to a few frames: every ISI must be a whole number of frames
+            'refresh_rate': 60,  # Expected display refresh rate (Hz), for the fast RSVP checks
+            'pulse_width': 0.04,  # Time a pulse code stays on (must be shorter than the shortest ISI)
             'seq_length': 10,  # Number of images per sequence
             'n_sequences': 1,  # Number of sequences
             'max_wait_response': 10.0,  # Maximum wait time for response
+            'response_window': 1.5,  # A press this long (seconds) after a line color change is a hit
             'min_blank_duration': 1.25,
             'max_rand_blank': 0.5,
             'daq_device': 'Dev1',  # DAQ device name
             'daq_port': 'port0',   # DAQ port name
-            'enable_screening': False  # Enable screening tests
+            'trigger_backend': 'mcc',  # Pulse code output: 'mcc', 'socket' or 'file'
+            'trigger_host': '127.0.0.1',  # Recorder address (socket backend)
+            'trigger_port': 5005,
+            'trigger_protocol': 'udp',  # 'udp' or 'tcp'
+            'trigger_file': 'experiment_data/triggers.log',  # Output file (file backend)
+            'telemetry': False,  # Stream live events to the experimenter console (rsvp_telemetry.py)
+            'telemetry_port': 5006,  # Localhost UDP port of the console
+            'telemetry_queue_size': 1000,  # Messages are dropped when this many are waiting
+            'event_log': True,  # Stream events to an append-only log while the session runs
+            'event_log_fsync_interval': 1.0,  # Seconds between fsyncs of the event log
+            'columnar_output': True,  # Also save the session as one Parquet file (needs pyarrow)
+            'enable_screening': False,  # Enable screening tests
+            'screening_mode': 'full',  # 'full' (interactive battery) or 'fast' (concurrent, pass/fail report)
+            'screening_skip_passed': True,  # Fast mode: skip checks that already passed today
+            'screening_cache': 'experiment_data/screening_cache.json',
+            'display_benchmark': False,  # Benchmark display timing before the session starts
+            'benchmark_flips': 2000,  # Flips per benchmark scenario (idle, image, full RSVP)
+            'benchmark_baseline_dir': 'experiment_data',  # Where display_baseline_<hostname>.json is kept
+            'benchmark_abort_on_regression': False,  # Do not start the session after a regression
+            'loader_workers': None,  # Image decode threads (None = automatic)
+            'stimulus_cache': True,  # Cache decoded images on disk
+            'cache_dir': 'stimulus_cache',
+            'cache_max_mb': 512,  # Cache size cap (least recently used entries evicted)
+            'texture_budget_mb': 256,  # GPU memory budget for resident image textures
+            'texture_lookahead': 2,  # Sequences whose textures are kept resident
+            'pulse_timing': 'worker',  # 'worker' (queued) or 'flip' (emitted on the buffer swap)
+            'lines_task': True,  # Colored lines above and below the images (color change detection)
+            'min_lines_onoff': 0.5,  # Lines appear/disappear this long into/before the end of the blanks
+            'max_rand_lines_onoff': 0.2,
+            'mean_change_interval': 10.0,  # Mean time between line color changes (seconds)
+            'size_line': 5,  # Line thickness (pixels)
+            'line_offset': 5  # Distance between the lines and the image (pixels)
         }
         
         # Load custom config if provided
@@ -66,27 +113,60 @@ class RSVPExperiment:
             print(f"  - Device: {self.config.get('device_response', 'default')}")
             print(f"  - Pulses: {self.config.get('withpulses', 'default')}")
         
+        # Fast RSVP: ISIs must be whole numbers of frames at the expected refresh rate
+        if self.config.get('fast_rsvp', False):
+            self.check_fast_rsvp(1.0 / self.config.get('refresh_rate', 60))
+        
         # Initialize experiment variables
         self.window = None
         self.images = []
         self.image_textures = []
         self.image_names = []
+        self.load_report = {}
+        self.startup_times = {}
+        self.on_startup_complete = None  # Called with startup_times once total_startup is logged
+        self.trial_structure = []
+        self.timelines = {}  # Compiled timeline of every sequence, by sequence number
         self.times = []
         self.responses = []
+        self.stats_lock = threading.Lock()  # Response statistics are read from other threads (server status)
+        self.response_stats = ResponseStats()  # Summary updated on every response
+        self.line_changes_shown = 0  # Lines task: color changes presented so far
+        self.hit_reaction_times = OnlineStats()  # Lines task: reaction times of hits only
         self.trial_data = []
         
         # Timing control variables (matching MATLAB)
         self.ifi = None  # Inter-frame interval
         self.slack = None  # Slack time (1/3 of IFI)
-        self.wait_reset = 0.04  # Must be shorter than shortest ISI
+        self.wait_reset = self.config.get('pulse_width', 0.04)  # Must be shorter than shortest ISI
         self.value_reset = 0
         self.tprev = None  # Previous time
+        self.scheduler = None  # Frame-count presentation scheduler
+        self.sequence_timing = []  # Planned vs achieved durations per sequence
+        self.frame_log = None  # Per-sequence frame intervals and dropped frames
         
         # Hardware components
         self.hardware = None
+        self.hardware_session = None  # HardwareSession with devices already probed (launcher)
+        self.keyboard = None
         self.gamepad = None
         self.pulse_gen = None
+        self.pulse_worker = None
+        self.flip_pulses = []  # Flip-locked pulses with their flip-to-pulse delay
+        self.response_time = None  # Sampled time of the last response (None if unknown)
         self.screening = None
+        self.screening_report = {}  # Report of the fast screening
+        self.benchmark_report = {}  # Display benchmark and its comparison with the baseline
+        self.telemetry = None  # Live event stream to the experimenter console
+        self.data_file = None  # Complete JSON file of the last saved session
+        self.filename_base = None  # Output path prefix of the current session
+        self.event_log = None  # Crash-safe event log of the current session
+        
+        # Run control from another thread (stimulus server): abort ends the
+        # run at the next poll, pause holds it before the next sequence
+        self.abort_requested = threading.Event()
+        self.resume = threading.Event()
+        self.resume.set()
         
         # Color definitions
         self.colors = {
@@ -97,6 +177,9 @@ class RSVPExperiment:
             'gray': [128, 128, 128]
         }
         
+        # Line color states as (top, bottom), as col_vals in the MATLAB version
+        self.line_states = [('red', 'red'), ('red', 'green'), ('green', 'red'), ('green', 'green')]
+        
         # Messages in different languages
         self.messages = {
             'ready_begin': {
@@ -156,6 +239,40 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
         except Exception as e:
             print(f"Error loading config: {e}")
     
+    def check_fast_rsvp(self, ifi, config=None):
+        """Raise ValueError unless every ISI is a whole number of frames and pulses fit in the shortest ISI
+        
+        Checks the experiment's configuration, or the given one (a
+        configuration about to be applied).
+        """
+        config = self.config if config is None else config
+        isi_values = config['isi']
+        errors = frame_multiple_errors(isi_values, ifi)
+        if errors:
+            details = ', '.join(f"{isi*1000:.2f} ms = {frames:.2f} frames" for isi, frames in errors)
+            raise ValueError(f"ISIs are not whole numbers of frames at {1/ifi:.1f} Hz "
+                             f"({ifi*1000:.3f} ms per frame): {details}")
+        
+        pulse_width = config.get('pulse_width', 0.04)
+        if config.get('withpulses', False) and pulse_width >= min(isi_values):
+            raise ValueError(f"pulse_width ({pulse_width*1000:.1f} ms) must be shorter than "
+                             f"the shortest ISI ({min(isi_values)*1000:.1f} ms)")
+        
+        frames = [int(round(isi / ifi)) for isi in isi_values]
+        print(f"Fast RSVP: ISIs of {frames} frames at {1/ifi:.1f} Hz")
+    
+    def check_measured_refresh(self, ifi):
+        """Warn when the measured frame interval shows an ISI as another number of frames
+        than the expected refresh rate does, returns the mismatches"""
+        nominal_ifi = 1.0 / self.config.get('refresh_rate', 60)
+        mismatches = frame_count_mismatches(self.config['isi'], nominal_ifi, ifi)
+        if mismatches:
+            details = ', '.join(f"{isi*1000:.2f} ms = {nominal} frames expected, {measured} measured"
+                                for isi, nominal, measured in mismatches)
+            print(f"⚠️  Measured refresh rate {1/ifi:.2f} Hz differs from refresh_rate "
+                  f"{1/nominal_ifi:.1f} Hz: {details}")
+        return mismatches
+    
     def save_config(self, config_file):
         """Save current configuration to JSON file"""
         try:
@@ -176,6 +293,8 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
             'Language': ['english', 'spanish', 'french']
         }
         
+        from psychopy import gui
+        
         dlg = gui.DlgFromDict(
             dictionary=participant_info,
             title='RSVP Experiment - Participant Information',
@@ -254,10 +373,47 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
         print(f"Inter-frame interval: {self.ifi*1000:.2f} ms")
         print(f"Slack time: {self.slack*1000:.2f} ms")
         
-        # Initialize hardware
-        self.hardware = create_hardware_manager(self.config)
+        # The ISIs were checked at the expected refresh rate; the measured one
+        # is never exact (59.94 Hz panels), only the frame counts are compared
+        if self.config.get('fast_rsvp', False):
+            self.check_measured_refresh(self.ifi)
+        
+        # Stimulus durations are presented as whole numbers of frames
+        self.scheduler = FrameScheduler(self.window, self.ifi)
+        self.frame_log = FrameTimingLog(self.window, self.ifi)
+        
+        # Initialize hardware (or take the devices the launcher already initialized)
+        if self.hardware_session:
+            self.hardware = self.hardware_session.devices()
+        else:
+            self.hardware = create_hardware_manager(self.config)
+        self.keyboard = self.hardware.get('keyboard')
         self.gamepad = self.hardware.get('gamepad')
         self.pulse_gen = self.hardware.get('pulse_gen')
+        for device, elapsed in self.hardware.get('init_times', {}).items():
+            self.startup_times[f"{device}_init"] = elapsed
+            print(f"[startup] {device}_init: {elapsed*1000:.0f} ms")
+        
+        # Gamepad presses are timestamped by the sampler at every input poll
+        sample_rate = self.config.get('gamepad_sample_rate', 1000)
+        if self.gamepad and sample_rate:
+            self.gamepad.start_sampler(rate=sample_rate)
+            print(f"Gamepad sampled at {sample_rate} Hz")
+        
+        # Pulses are output by a worker thread, never by the render loop
+        if self.pulse_gen:
+            self.pulse_gen.wait_reset = self.wait_reset
+            self.pulse_worker = PulseWorker(self.pulse_gen, on_error=self.report_pulse_error)
+            self.pulse_worker.start()
+        
+        # Live telemetry (publishing only queues the message)
+        if self.config.get('telemetry', False):
+            self.telemetry = TelemetryPublisher(
+                port=self.config.get('telemetry_port', 5006),
+                queue_size=self.config.get('telemetry_queue_size', 1000),
+                clock=session_clock
+            )
+            self.telemetry.start()
         
         # Initialize screening tools
         self.screening = ScreeningTools(self.window)
@@ -266,50 +422,163 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
         return True
     
     def load_images(self):
-        """Load all images from the pictures directory"""
+        """Load all images from the pictures directory or a stimulus bundle"""
+        decoded_images = self.read_images()
+        self.create_textures(decoded_images)
+        
+        return len(self.image_textures) > 0
+    
+    def read_images(self):
+        """CPU side of image loading (no GL calls, safe to run in a background thread)"""
         pictures_path = self.config['pictures_path']
         
         if not os.path.exists(pictures_path):
             raise FileNotFoundError(f"Pictures directory not found: {pictures_path}")
         
-        # Find all image files
-        image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp']
-        image_files = []
+        if is_stimulus_bundle(pictures_path):
+            decoded_images = self.load_bundle(pictures_path)
+        else:
+            decoded_images = self.decode_images(pictures_path)
         
-        for ext in image_extensions:
-            image_files.extend(glob.glob(os.path.join(pictures_path, ext)))
-            image_files.extend(glob.glob(os.path.join(pictures_path, ext.upper())))
+        self.image_names = [record['name'] for record in decoded_images]
+        print_load_report(self.load_report)
+        
+        # Save image names for reference
+        self.save_image_names()
+        
+        return decoded_images
+    
+    def create_textures(self, decoded_images):
+        """Create the texture manager for decoded images (window thread only)"""
+        # Textures of previously loaded images (stimulus server reload)
+        if isinstance(self.image_textures, TextureManager):
+            self.image_textures.release_all()
+        
+        # Lines are drawn around the first image's rect (destRect{1} in MATLAB)
+        lines_layout = None
+        if self.config.get('lines_task', True) and decoded_images:
+            height, width = decoded_images[0]['pixels'].shape[:2]
+            lines_layout = {
+                'width': width,
+                'height': height,
+                'size_line': self.config.get('size_line', 5),
+                'offset': self.config.get('line_offset', 5),
+                'states': [(self.colors[up], self.colors[down]) for up, down in self.line_states]
+            }
+        
+        # Textures are created per sequence by the texture manager
+        self.image_textures = TextureManager(
+            window=self.window,
+            decoded_images=decoded_images,
+            budget_bytes=int(self.config.get('texture_budget_mb', 256) * 1024 * 1024),
+            lookahead=self.config.get('texture_lookahead', 2),
+            lines=lines_layout
+        )
+        if self.trial_structure:
+            self.image_textures.set_schedule(self.trial_structure)
+        
+        print(f"Successfully loaded {len(self.image_textures)} images")
+    
+    def prepare_stimuli(self):
+        """Decode images and generate the trial structure (background loading stage)"""
+        start_time = time.perf_counter()
+        decoded_images = self.read_images()
+        self.log_phase('stimulus_decode', start_time)
+        
+        start_time = time.perf_counter()
+        self.generate_trial_structure()
+        self.log_phase('trial_generation', start_time)
+        
+        return decoded_images
+    
+    def run_display_benchmark(self, save_baseline=False):
+        """Benchmark the display under idle, image and RSVP load, returns the report
+        
+        Only needs the window: neutral textures of the display size are drawn,
+        at the shortest ISI. The report is compared with this machine's
+        baseline (regressions under report['baseline']) and saved next to the
+        session data.
+        """
+        side = min(self.config['window_resolution'])
+        scenarios = neutral_scenarios(self.window, (side, side), min(self.config['isi']), self.ifi)
+        benchmark = DisplayBenchmark(self.window, ifi=self.ifi, n_flips=self.config.get('benchmark_flips', 2000))
+        no_gc = ('rsvp',) if self.config.get('fast_rsvp', False) else ()
+        self.benchmark_report = benchmark.run(scenarios, no_gc=no_gc)
+        check_against_baseline(self.benchmark_report, self.config.get('benchmark_baseline_dir', 'experiment_data'),
+                               save_baseline=save_baseline)
+        
+        if self.filename_base:
+            benchmark_filename = f"{self.filename_base}_display_benchmark.json"
+            save_report(benchmark_filename, self.benchmark_report)
+            print(f"Display benchmark saved to {benchmark_filename}")
+        self.log_event('display_benchmark', **self.benchmark_report)
+        return self.benchmark_report
+    
+    def log_phase(self, phase, start_time):
+        """Record and print how long a startup phase took"""
+        elapsed = time.perf_counter() - start_time
+        self.startup_times[phase] = elapsed
+        print(f"[startup] {phase}: {elapsed*1000:.0f} ms")
+        if phase == 'total_startup' and self.on_startup_complete:
+            self.on_startup_complete(self.startup_times)
+    
+    def decode_images(self, pictures_path):
+        """Decode and resize all images of a pictures directory"""
+        # Find all image files (single directory scan)
+        image_files = find_image_files(pictures_path)
         
         if not image_files:
             raise FileNotFoundError(f"No image files found in {pictures_path}")
         
         print(f"Found {len(image_files)} images")
         
-        # Load images and create textures
-        self.image_names = []
-        self.image_textures = []
+        # Decode and resize to the display size on a worker pool
+        # (warm starts memory-map the cached arrays instead of decoding)
+        cache = None
+        if self.config.get('stimulus_cache', True):
+            cache = StimulusCache(
+                cache_dir=self.config.get('cache_dir', 'stimulus_cache'),
+                max_bytes=int(self.config.get('cache_max_mb', 512) * 1024 * 1024)
+            )
         
-        for img_file in image_files:
-            try:
-                # Create image stimulus
-                img_stim = visual.ImageStim(
-                    win=self.window,
-                    image=img_file,
-                    units='pix'
-                )
-                
-                self.image_textures.append(img_stim)
-                self.image_names.append(os.path.basename(img_file))
-                
-            except Exception as e:
-                print(f"Error loading image {img_file}: {e}")
+        loader = StimulusLoader(
+            max_size=self.config['window_resolution'],
+            workers=self.config.get('loader_workers'),
+            cache=cache
+        )
+        decoded_images = loader.decode_images(image_files)
         
-        print(f"Successfully loaded {len(self.image_textures)} images")
+        self.load_report = loader.build_report(decoded_images)
+        return decoded_images
+    
+    def load_bundle(self, bundle_path):
+        """Memory-map a stimulus bundle (images are already resized)"""
+        start_time = time.perf_counter()
         
-        # Save image names for reference
-        self.save_image_names()
+        bundle = StimulusBundle(bundle_path)
+        decoded_images = bundle.records()
         
-        return len(self.image_textures) > 0
+        print(f"Opened stimulus bundle {bundle_path} with {len(bundle)} images")
+        
+        self.load_report = build_load_report(
+            decoded_images, time.perf_counter() - start_time, workers=0, max_size=bundle.max_size
+        )
+        return decoded_images
+    
+    def check_stimulus_size(self):
+        """Compare the size images were decoded for with the real window size
+        
+        Images are decoded before the window exists, for window_resolution;
+        a fullscreen window can have another size. A mismatch is reported
+        once and saved with the load report.
+        """
+        window_size = [int(side) for side in self.window.size]
+        self.load_report['window_size'] = window_size
+        decoded_size = self.load_report.get('max_size')
+        if decoded_size and list(decoded_size) != window_size:
+            print(f"Warning: images were decoded for {decoded_size[0]}x{decoded_size[1]}, "
+                  f"the window is {window_size[0]}x{window_size[1]}")
+            self.log_event('stimulus_size_mismatch', decoded_size=list(decoded_size), window_size=window_size)
     
     def save_image_names(self):
         """Save the list of image names used"""
@@ -328,7 +597,7 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
     
     def generate_trial_structure(self):
         """Generate the trial structure and color changes"""
-        n_images = len(self.image_textures)
+        n_images = len(self.image_names)
         isi_values = self.config['isi']
         seq_length = self.config['seq_length']
         n_sequences = self.config['n_sequences']
@@ -336,37 +605,127 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
         if n_images < seq_length:
             raise ValueError(f"Not enough images ({n_images}) for sequence length ({seq_length})")
         
+        # Random timing parameters (matching MATLAB)
+        min_blank = self.config['min_blank_duration']
+        max_rand_blank = self.config['max_rand_blank']
+        
         # Generate image order for each sequence
         self.trial_structure = []
+        self.timelines = {}
         
         for seq_idx in range(n_sequences):
             # Randomly select images for this sequence
             selected_images = random.sample(range(n_images), seq_length)
             
-            # Select ISI for this sequence
-            isi = random.choice(isi_values)
-            
+            # Select ISI for this sequence, or one per image (MATLAB's which_ISI)
             sequence_info = {
                 'sequence_number': seq_idx + 1,
                 'image_indices': selected_images,
-                'isi': isi
+                'isi': random.choice(isi_values),
+                'blank_duration': min_blank + max_rand_blank * random.random()
             }
+            if self.config.get('mixed_isi', False):
+                sequence_info['isis'] = [random.choice(isi_values) for _ in selected_images]
+                sequence_info['isi'] = min(sequence_info['isis'])
+            isi = sequence_info['isi']
+            
+            if self.config.get('lines_task', True):
+                sequence_info['lines'] = self.generate_line_changes(seq_length, isi, sequence_info['blank_duration'])
             
             self.trial_structure.append(sequence_info)
         
+        # Let the texture manager know which images come next
+        if isinstance(self.image_textures, TextureManager):
+            self.image_textures.set_schedule(self.trial_structure)
+        
         print(f"Generated {len(self.trial_structure)} sequences")
     
+    def generate_line_changes(self, seq_length, isi, blank_duration):
+        """Line colors and color changes of one sequence (create_lines_change_RSVP_SCR.m)
+        
+        About one change per mean_change_interval seconds of images, on
+        images 2 to seq_length-1, between ISI/4 and 3*ISI/4 after the image
+        onset (the shortest ISI with mixed ISIs, ISI(1) in MATLAB).
+        Consecutive line states always differ.
+        """
+        mean_changes = round(seq_length * isi / self.config.get('mean_change_interval', 10.0))
+        n_changes = min(max(0, mean_changes + random.randint(1, 3) - 2), max(0, seq_length - 2))
+        positions = sorted(random.sample(range(1, seq_length - 1), n_changes))
+        
+        # Concatenated permutations of the states, without repeats
+        n_states = len(self.line_states)
+        while True:
+            states = []
+            for _ in range(n_changes // n_states + 2):
+                states += random.sample(range(n_states), n_states)
+            if all(a != b for a, b in zip(states, states[1:])):
+                break
+        
+        min_onoff = self.config.get('min_lines_onoff', 0.5)
+        max_rand_onoff = self.config.get('max_rand_lines_onoff', 0.2)
+        
+        return {
+            'start_state': states[0],
+            'lines_on': min_onoff + max_rand_onoff * random.random(),
+            'lines_off': blank_duration - (min_onoff + max_rand_onoff * random.random()),
+            'changes': [{
+                'position': position,
+                'time': isi / 4 + random.random() * isi / 2,
+                'state': states[k + 1]
+            } for k, position in enumerate(positions)]
+        }
+    
+    def compile_timelines(self):
+        """Compile every sequence into a timeline of events (needs the frame interval)"""
+        for sequence_info in self.trial_structure:
+            self.compile_timeline(sequence_info)
+        
+        # Texture keys as the timelines show them
+        if isinstance(self.image_textures, TextureManager):
+            self.image_textures.set_schedule(self.trial_structure, self.timelines)
+    
+    def compile_timeline(self, sequence_info):
+        """Compile one sequence; stimulus ids, onsets and pulse codes are fixed ahead of time"""
+        pulse_codes = self.pulse_gen.pulse_codes if self.pulse_gen else PULSE_CODES
+        timeline = compile_sequence_timeline(sequence_info, self.ifi, pulse_codes)
+        self.timelines[sequence_info['sequence_number']] = timeline
+        return timeline
+    
     
     def check_for_response(self):
-        """Check for response from keyboard or gamepad (edge-triggered like MATLAB)"""
+        """Check for response from keyboard or gamepad (edge-triggered like MATLAB)
+        
+        self.response_time is set to the sampled press time (session clock)
+        when it is known, None otherwise.
+        """
         response = None
+        self.response_time = None
         
-        # Check keyboard
-        keys = event.getKeys()
-        if 'escape' in keys:
+        # Abort requested by the stimulus server counts as escape
+        if self.abort_requested.is_set():
             return 'escape'
-        if 'space' in keys:
-            return 'space'
+        
+        # Check keyboard (key-down time known with the timestamped backend)
+        if self.keyboard:
+            presses = self.keyboard.get_presses()
+        else:
+            presses = [(key, None) for key in event.getKeys()]
+        if any(name == 'escape' for name, _ in presses):
+            return 'escape'
+        for name, press_time in presses:
+            if name == 'space':
+                self.response_time = press_time
+                return 'space'
+        
+        # Gamepad presses from the sampler: take the first press edge
+        sampler = self.gamepad.sampler if self.gamepad else None
+        if sampler and sampler.running:
+            for press_time, button, pressed in sampler.drain():
+                if pressed and button in (0, 1) and response is None:
+                    print(f"Button {button} ({'X' if button == 0 else 'A'}) pressed")
+                    self.response_time = press_time
+                    response = 'space'
+            return response
         
         # Check gamepad if available (edge-triggered like MATLAB)
         if self.gamepad and self.gamepad.connected:
@@ -436,8 +795,12 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
             
             core.wait(0.016)
     
-    def show_message(self, message_key):
-        """Display a message and wait for response"""
+    def show_message(self, message_key, while_waiting=None):
+        """Display a message and wait for response
+        
+        while_waiting is called once, right after the message is first on
+        screen (used to upload the next sequence's textures).
+        """
         lang = self.config['language']
         message_text = self.messages[message_key][lang]
         
@@ -453,6 +816,10 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
             message.draw()
             self.window.flip()
             
+            if while_waiting:
+                while_waiting()
+                while_waiting = None
+            
             response = self.check_for_response()
             if response == 'escape':
                 return False
@@ -463,140 +830,275 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
     
     
     def run_sequence(self, sequence_info):
-        """Run a single RSVP sequence (simplified - images only)"""
+        """Run a single RSVP sequence (simplified - images only)
+        
+        The sequence is executed from its compiled timeline: every event is
+        shown for a whole number of frames (counted vsyncs) and input is
+        polled between flips.
+        """
         seq_num = sequence_info['sequence_number']
         image_indices = sequence_info['image_indices']
         isi = sequence_info['isi']
         
-        print(f"Running sequence {seq_num} with {len(image_indices)} images, ISI={isi}s")
+        timeline = self.timelines.get(seq_num)
+        if timeline is None:
+            timeline = self.compile_timeline(sequence_info)
+        
+        if sequence_info.get('isis'):
+            print(f"Running sequence {seq_num} with {len(image_indices)} images, mixed ISIs "
+                  f"{sorted(set(self.scheduler.frames_for(value) for value in sequence_info['isis']))} frames")
+        else:
+            print(f"Running sequence {seq_num} with {len(image_indices)} images, ISI={isi}s "
+                  f"({self.scheduler.frames_for(isi)} frames)")
+        
+        self.publish('sequence_start', sequence=seq_num, n_images=len(image_indices), isi=isi)
         
         # Initialize response tracking
         sequence_responses = []
-        k = 0  # Time index counter (matching MATLAB)
         
         # Initialize button state tracking for edge-triggered detection
         self._button_0_was_pressed = False
         self._button_1_was_pressed = False
-        
-        # Random timing parameters (matching MATLAB)
-        min_blank = self.config['min_blank_duration']
-        max_rand_blank = self.config['max_rand_blank']
-        
-        randTime_blank = min_blank + max_rand_blank * random.random()
-        
-        # Initialize timing
-        self.times = []
-        sequence_clock = core.Clock()  # Use PsychoPy clock for timing
-        
-        # Initial blank screen
-        self.window.clearBuffer()
-        times_k = self.window.flip()
-        self.times.append(times_k)
-        k += 1
-        
-        # Send initial blank pulse
-        if self.pulse_gen and self.pulse_gen.available:
-            self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['blank_on'])
-            time.sleep(self.wait_reset)
-            self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['value_reset'])
-        
-        self.tprev = times_k
-        k += 1
-        
-        # Present image sequence
-        for img_idx, image_index in enumerate(image_indices):
-            # Draw image only
-            self.window.clearBuffer()
-            self.image_textures[image_index].draw()
-            
-            # Calculate flip time (matching MATLAB timing)
-            if img_idx == 0:
-                flip_time = self.tprev + randTime_blank - self.slack
+        if self.gamepad and self.gamepad.sampler:
+            self.gamepad.sampler.clear()
+        if self.keyboard:
+            self.keyboard.clear()
+        
+        # Initialize timing (self.times keeps the onset flip of every stimulus)
+        self.scheduler.start_sequence()
+        self.frame_log.start_sequence()
+        
+        # Timeline columns as plain lists for the executor loop
+        event_types = timeline['event_type'].tolist()
+        positions = timeline['position'].tolist()
+        frame_counts = timeline['n_frames'].tolist()
+        pulse_values = timeline['pulse_code'].tolist()
+        labels = [event_label(event_type, position) for event_type, position in zip(event_types, positions)]
+        texture_keys = [event_texture_key(stim_id, lines) for stim_id, lines
+                        in zip(timeline['stim_id'].tolist(), timeline['lines'].tolist())]
+        image_positions = [position if event_type in (EVENT_IMAGE, EVENT_LINES_CHANGE) else None
+                           for event_type, position in zip(event_types, positions)]
+        
+        # Current event, image on screen and its onset flip time (session
+        # clock), and the same for the previous event
+        current = {'event': 0, 'img_idx': None, 'start_time': 0.0, 'previous': (None, 0.0)}
+        
+        # Lines task: color changes shown so far (position, onset flip and
+        # whether a response has already been scored against it)
+        change_detection = self.config.get('lines_task', True)
+        line_changes = []
+        response_window = self.config.get('response_window', 1.5)
+        
+        # Pulses go out through the pulse worker, or right after the buffer
+        # swap (window.callOnFlip) in flip-locked mode
+        pulses_enabled = bool(self.pulse_gen and self.pulse_gen.available)
+        flip_locked = pulses_enabled and self.config.get('pulse_timing', 'worker') == 'flip'
+        n_flip_pulses = len(self.flip_pulses)
+        
+        # Flip-locked response codes wait for a flip without an event code:
+        # two codes written on the same flip would overwrite each other
+        # within microseconds and the recorder would miss one of them
+        flip_state = {'frames_left': 0, 'response_pending': False}
+        
+        def emit_pending_response():
+            if flip_state['response_pending'] and flip_state['frames_left'] > 0:
+                self.window.callOnFlip(self.emit_flip_pulse, self.pulse_gen.pulse_codes['resp_offset'], 'response')
+                flip_state['response_pending'] = False
+        
+        def on_onset(flip_time):
+            i = current['event']
+            flip_state['frames_left'] = frame_counts[i]
+            self.times.append(flip_time)
+            self.tprev = flip_time
+            
+            # Send image onset / blank / lines pulse
+            if pulses_enabled and not flip_locked:
+                self.send_event_pulse(pulse_values[i], when=flip_time)
+            
+            current['previous'] = (current['img_idx'], current['start_time'])
+            current['img_idx'] = image_positions[i]
+            current['start_time'] = flip_time
+            if event_types[i] == EVENT_LINES_CHANGE:
+                line_changes.append({'position': positions[i], 'onset': flip_time, 'detected': False})
+                with self.stats_lock:
+                    self.line_changes_shown += 1
+            self.publish('onset', sequence=seq_num, label=labels[i], t=flip_time)
+        
+        def poll():
+            if flip_locked:
+                self.complete_flip_pulses(self.scheduler.last_flip_time)
+                flip_state['frames_left'] -= 1  # Frames of the current event still to flip
+                emit_pending_response()
+            
+            response = self.check_for_response()
+            if response == 'escape':
+                return False
+            
+            if response != 'space':
+                return True
+            
+            # A sampled press may predate the onset the loop has just shown
+            img_idx, start_time = current['img_idx'], current['start_time']
+            response_time = self.response_time if self.response_time is not None else session_clock.now()
+            if response_time < start_time:
+                img_idx, start_time = current['previous']
+            
+            # Lines task: the first response within response_window of a line
+            # color change is a hit, RT from the flip that showed the change;
+            # any other response while an image is on screen is a false alarm.
+            # Without the lines task every response to an image counts, RT
+            # from the image onset
+            change = None
+            if change_detection:
+                change = next((change for change in line_changes if not change['detected']
+                               and change['onset'] <= response_time <= change['onset'] + response_window), None)
+            if change is not None:
+                change['detected'] = True
+                img_idx, rt, correct = change['position'], response_time - change['onset'], True
+                with self.stats_lock:
+                    self.hit_reaction_times.update(rt)
+            elif img_idx is not None:
+                rt, correct = response_time - start_time, not change_detection
             else:
-                flip_time = self.tprev + isi - self.slack
+                return True
             
-            times_k = self.window.flip(flip_time)
-            self.times.append(times_k)
+            self.record_response(seq_num, img_idx, rt, correct, response_time)
+            sequence_responses.append({
+                'sequence': seq_num,
+                'image_position': img_idx + 1,
+                'reaction_time': rt,
+                'correct': correct
+            })
             
-            # Send image onset pulse
-            if self.pulse_gen and self.pulse_gen.available:
-                if img_idx == 0:
-                    pulse_value = self.pulse_gen.pulse_codes['pic_onoff_2'][0]
-                else:
-                    pulse_value = self.pulse_gen.pulse_codes['pic_onoff_1'][0] if img_idx % 2 == 0 else self.pulse_gen.pulse_codes['pic_onoff_2'][0]
-                
-                self.pulse_gen.send_pulse(pulse_value)
-                time.sleep(self.wait_reset)
-                self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['value_reset'])
-            
-            self.tprev = times_k
-            k += 1
-            
-            # Wait for ISI time and check for responses
-            isi_start_time = sequence_clock.getTime()
-            while (sequence_clock.getTime() - isi_start_time) < isi:
-                response = self.check_for_response()
-                if response == 'space':
-                    rt = sequence_clock.getTime() - isi_start_time
-                    self.record_response(seq_num, img_idx, rt, True)
-                    sequence_responses.append({
-                        'sequence': seq_num,
-                        'image_position': img_idx + 1,
-                        'reaction_time': rt,
-                        'correct': True
-                    })
-                    
-                    # Send response pulse
-                    if self.pulse_gen and self.pulse_gen.available:
-                        self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['resp_offset'])
-                        time.sleep(self.wait_reset)
-                        self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['value_reset'])
-                    
-                    print(f"Response recorded: Button press at image {img_idx + 1}, RT={rt:.3f}s")
-                    
-                elif response == 'escape':
-                    return False
-                
-                core.wait(0.001)
-        
-        # Final blank screen
-        self.window.clearBuffer()
-        times_k = self.window.flip(self.tprev + isi - self.slack)
-        self.times.append(times_k)
-        
-        # Send final blank pulse
-        if self.pulse_gen and self.pulse_gen.available:
-            self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['blank_on'])
-            time.sleep(self.wait_reset)
-            self.pulse_gen.send_pulse(self.pulse_gen.pulse_codes['value_reset'])
+            # Send response pulse (flip-locked mode: on the next flip without an event code)
+            if flip_locked:
+                flip_state['response_pending'] = True
+                emit_pending_response()
+            elif pulses_enabled:
+                self.send_event_pulse(self.pulse_gen.pulse_codes['resp_offset'])
+            
+            if change_detection:
+                print(f"Response recorded: {'Hit' if correct else 'False alarm'} at image {img_idx + 1}, RT={rt:.3f}s")
+            else:
+                print(f"Response recorded: Button press at image {img_idx + 1}, RT={rt:.3f}s")
+            return True
         
-        self.tprev = times_k
-        k += 1
+        # Initial blank, image sequence and final blank
+        for i in range(len(timeline)):
+            current['event'] = i
+            # Image and lines are one precomposed texture (a single draw call)
+            key = texture_keys[i]
+            draw = self.image_textures[key].draw if key is not None else None
+            on_flip = None
+            if flip_locked:
+                on_flip = lambda value=pulse_values[i], label=labels[i]: self.emit_flip_pulse(value, label)
+            
+            if not self.scheduler.present_frames(draw, frame_counts[i], labels[i], poll=poll,
+                                                 on_onset=on_onset, on_flip=on_flip):
+                return False
         
-        # Wait for final blank duration
-        final_wait_time = randTime_blank
-        if final_wait_time > 0:
-            core.wait(final_wait_time)
+        # The last flip carries no event code
+        if flip_locked and flip_state['response_pending']:
+            flip_state['frames_left'] = 1
+            emit_pending_response()
+        self.scheduler.finish()
+        
+        if flip_locked:
+            self.complete_flip_pulses(self.scheduler.last_flip_time)
+            print_flip_pulse_delays(self.flip_pulses[n_flip_pulses:])
+        
+        # Planned versus achieved duration of every stimulus
+        timing_report = self.scheduler.report()
+        self.sequence_timing.append({'sequence_number': seq_num, 'stimuli': timing_report})
+        print_timing_report(timing_report)
+        
+        # Frame intervals, dropped frames and ISI error percentiles
+        frame_summary = self.frame_log.end_sequence(seq_num, timing_report)
+        print_frame_summary(frame_summary)
+        self.log_event('sequence_timing', sequence=seq_num, stimuli=timing_report, frames=frame_summary)
+        if frame_summary['dropped_frames'] or frame_summary['missed_deadlines']:
+            self.publish('dropped_frames', sequence=seq_num,
+                         dropped_frames=frame_summary['dropped_frames'],
+                         missed_deadlines=frame_summary['missed_deadlines'])
         
         print(f"Sequence {seq_num} completed. Responses: {len(sequence_responses)}")
+        summary = self.calculate_summary()
+        if summary.get('total_responses'):
+            print(f"Session so far: {summary['total_responses']} responses, "
+                  f"accuracy {summary['accuracy']:.1f}%, mean RT {summary['mean_reaction_time']:.3f}s, "
+                  f"median RT {summary['median_reaction_time']:.3f}s")
+        if 'line_changes' in summary:
+            print(f"Line changes: {summary['hits']} hits of {summary['line_changes']}, "
+                  f"{summary['false_alarms']} false alarms")
+            if summary['mean_hit_reaction_time'] is not None:
+                print(f"Hit RT: mean {summary['mean_hit_reaction_time']:.3f}s, "
+                      f"median {summary['median_hit_reaction_time']:.3f}s")
+        self.publish('sequence_end', sequence=seq_num, n_responses=len(sequence_responses), summary=summary)
         return True
     
+    def send_event_pulse(self, value, when=None):
+        """Queue an event code (the worker resets the line after wait_reset)"""
+        self.pulse_worker.submit(value, when)
+    
+    def emit_flip_pulse(self, value, event):
+        """Output an event code right after the buffer swap (runs inside window.flip)"""
+        on_time = self.pulse_gen.set_value(value)
+        if on_time is None:
+            self.publish('pulse_error', value=value, event=event)
+            return
+        
+        # The reset (and its off time) is left to the pulse worker so the flip never waits
+        pulse = {
+            'event': event,
+            'value': value,
+            'on': on_time,
+            'off': None,
+            'flip_time': None,
+            'delay': None
+        }
+        self.flip_pulses.append(pulse)
+        self.pulse_worker.submit_reset(pulse)
+    
+    def complete_flip_pulses(self, flip_time):
+        """Attach the flip timestamp (returned by window.flip) and flip-to-pulse delay to new flip-locked pulses"""
+        for pulse in reversed(self.flip_pulses):
+            if pulse['flip_time'] is not None:
+                break
+            pulse['flip_time'] = flip_time
+            pulse['delay'] = pulse['on'] - flip_time
     
-    def record_response(self, sequence, image_position, reaction_time, correct):
-        """Record a participant response"""
+    def record_response(self, sequence, image_position, reaction_time, correct, response_time=None):
+        """Record a participant response (response_time: when it was sampled, session clock)"""
+        if response_time is None:
+            response_time = session_clock.now()
+        
         response_data = {
             'sequence_number': sequence,
             'image_position': image_position,
             'reaction_time': reaction_time,
             'correct': correct,
-            'timestamp': datetime.now().isoformat()
+            'response_time': response_time,
+            'timestamp': session_clock.isoformat(response_time)
         }
         
-        self.responses.append(response_data)
-        self.times.append(core.getTime())
+        with self.stats_lock:
+            self.responses.append(response_data)
+            self.response_stats.update(reaction_time, correct)
+        self.publish('response', sequence=sequence, image_position=image_position + 1,
+                     reaction_time=reaction_time, correct=correct, t=response_time)
     
-    def save_data(self, participant_info):
-        """Save all experimental data"""
+    def publish(self, kind, **fields):
+        """Record an event in the event log and send it as a telemetry message"""
+        self.log_event(kind, **fields)
+        if self.telemetry:
+            self.telemetry.publish(kind, **fields)
+    
+    def report_pulse_error(self, record):
+        """Called by the pulse worker thread when a pulse could not be written"""
+        self.publish('pulse_error', value=record['value'], scheduled=record['scheduled'])
+    
+    def session_filename_base(self, participant_info):
+        """Output path prefix of the session (participant, session number, start time)"""
         output_dir = "experiment_data"
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -605,10 +1107,36 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
         participant_id = participant_info.get('Participant ID', 'unknown')
         session = participant_info.get('Session Number', 1)
         
-        filename_base = f"{output_dir}/RSVP_{participant_id}_session_{session}_{timestamp}"
+        self.filename_base = f"{output_dir}/RSVP_{participant_id}_session_{session}_{timestamp}"
+        return self.filename_base
+    
+    def start_event_log(self, participant_info):
+        """Open the event log of the session (records are written by a background thread)"""
+        filename_base = self.session_filename_base(participant_info)
+        if not self.config.get('event_log', True):
+            return
+        
+        self.event_log = EventLog(
+            f"{filename_base}_events.jsonl",
+            fsync_interval=self.config.get('event_log_fsync_interval', 1.0),
+            clock=session_clock
+        )
+        self.event_log.start()
+        self.log_event('session_start', participant_info=participant_info, config=dict(self.config),
+                       clock=session_clock.info())
+    
+    def log_event(self, kind, **fields):
+        """Queue a record for the event log (no-op when there is no log)"""
+        if self.event_log:
+            self.event_log.write(kind, **fields)
+    
+    def save_data(self, participant_info):
+        """Save all experimental data (and finalize the event log)"""
+        filename_base = self.filename_base or self.session_filename_base(participant_info)
         
         # Save responses as CSV
         if self.responses:
+            import pandas as pd
             df = pd.DataFrame(self.responses)
             csv_filename = f"{filename_base}_responses.csv"
             df.to_csv(csv_filename, index=False)
@@ -622,80 +1150,260 @@ Appuyez sur BARRE D'ESPACE pour commencer.'''
             'responses': self.responses,
             'times': self.times,
             'image_names': self.image_names,
+            'load_report': self.load_report,
+            'sequence_timing': self.sequence_timing,
+            'frame_timing': self.frame_log.summaries if self.frame_log else [],
+            'pulses': self.pulse_worker.records if self.pulse_worker else [],
+            'flip_pulses': self.flip_pulses,
+            'trigger_latency': self.pulse_gen.latency() if self.pulse_gen else {},
+            'hardware_inventory': self.hardware_session.inventory if self.hardware_session else {},
+            'screening': self.screening_report,
+            'display_benchmark': self.benchmark_report,
+            'telemetry': self.telemetry.stats() if self.telemetry else {},
+            'gamepad_sampler': self.gamepad.sampler.stats() if self.gamepad and self.gamepad.sampler else {},
+            'texture_stats': self.image_textures.stats() if isinstance(self.image_textures, TextureManager) else {},
+            'startup_times': self.startup_times,
             'start_time': datetime.now().isoformat(),
+            'clock': session_clock.info(),
             'summary': self.calculate_summary()
         }
         
+        # Everything above is already in the event log; close it and index it
+        if self.event_log:
+            self.log_event('session_end', summary=experiment_data['summary'])
+            experiment_data['event_log'] = self.event_log.finalize()
+            self.event_log = None
+        
+        # Compiled timelines (what was planned for every sequence)
+        if self.timelines:
+            timelines_filename = f"{filename_base}_timelines.npz"
+            np.savez(timelines_filename, **{f"sequence_{number}": timeline
+                                            for number, timeline in self.timelines.items()})
+            print(f"Sequence timelines saved to {timelines_filename}")
+        
+        # Raw frame intervals of every sequence
+        if self.frame_log and self.frame_log.intervals:
+            intervals_filename = f"{filename_base}_frame_intervals.npz"
+            self.frame_log.save(intervals_filename)
+            print(f"Frame intervals saved to {intervals_filename}")
+        
+        # Typed tables (events, responses, pulses, frame intervals) and metadata in one file
+        if self.config.get('columnar_output', True):
+            if load_arrow():
+                parquet_filename = f"{filename_base}_session.parquet"
+                tables = ('responses', 'times', 'sequence_timing', 'pulses', 'flip_pulses')
+                n_rows = write_session_table(
+                    parquet_filename,
+                    metadata={key: value for key, value in experiment_data.items() if key not in tables},
+                    sequence_timing=self.sequence_timing,
+                    timelines=self.timelines,
+                    image_names=self.image_names,
+                    responses=self.responses,
+                    pulses=self.pulse_worker.records if self.pulse_worker else [],
+                    flip_pulses=self.flip_pulses,
+                    frame_intervals=self.frame_log.intervals if self.frame_log else {}
+                )
+                print(f"Session tables saved to {parquet_filename} ({n_rows} rows)")
+            else:
+                print("pyarrow not available - columnar session file not saved")
+        
         json_filename = f"{filename_base}_complete.json"
         with open(json_filename, 'w') as f:
             json.dump(experiment_data, f, indent=2)
+        self.data_file = json_filename
         
         print(f"Complete data saved to {json_filename}")
         
         return True
     
-    def calculate_summary(self):
-        """Calculate summary statistics"""
-        if not self.responses:
-            return {}
-        
-        df = pd.DataFrame(self.responses)
-        
-        summary = {
-            'total_responses': len(df),
-            'correct_responses': sum(df['correct']),
-            'accuracy': sum(df['correct']) / len(df) * 100,
-            'mean_reaction_time': df['reaction_time'].mean(),
-            'median_reaction_time': df['reaction_time'].median(),
-            'std_reaction_time': df['reaction_time'].std()
-        }
+    def reset_session(self):
+        """Clear the data of the previous session, keeping window, hardware and textures"""
+        with self.stats_lock:
+            self.responses = []
+            self.response_stats = ResponseStats()
+            self.line_changes_shown = 0
+            self.hit_reaction_times = OnlineStats()
+        self.times = []
+        self.trial_data = []
+        self.sequence_timing = []
+        self.timelines = {}  # Compiled again from the trial structure of the next run
+        self.flip_pulses = []
+        self.startup_times = {}
+        self.data_file = None
+        self.filename_base = None
+        self.event_log = None
+        self.tprev = None
+        self.frame_log = FrameTimingLog(self.window, self.ifi)
+        self.abort_requested.clear()
+        self.resume.set()
+        
+        # Fresh pulse records
+        if self.pulse_worker:
+            self.pulse_worker.stop()
+        if self.pulse_gen:
+            self.pulse_gen.wait_reset = self.wait_reset
+            self.pulse_worker = PulseWorker(self.pulse_gen, on_error=self.report_pulse_error)
+            self.pulse_worker.start()
+    
+    def run_sequences(self):
+        """Run every sequence of the trial structure, returns False if the run was cancelled"""
+        self.log_event('trial_structure', sequences=self.trial_structure, image_names=self.image_names)
         
-        return summary
+        # Send experiment signature pulses at start (matching MATLAB)
+        if self.pulse_gen and self.pulse_gen.available:
+            print("Sending experiment signature pulses...")
+            self.pulse_gen.send_signature_pulses()
+        
+        completed = True
+        for seq_position, sequence_info in enumerate(self.trial_structure):
+            # Paused from the stimulus server: hold before the next sequence
+            while not self.resume.wait(0.05):
+                if self.abort_requested.is_set():
+                    break
+                self.window.flip()
+            
+            # Show ready message (upcoming textures are uploaded meanwhile)
+            prepare_textures = lambda: self.image_textures.prepare(seq_position)
+            if not self.show_message('ready_continue', while_waiting=prepare_textures):
+                print("Experiment cancelled by user")
+                completed = False
+                break
+            
+            # Run sequence (fast RSVP: no garbage collection pauses during the sequence)
+            fast_rsvp = self.config.get('fast_rsvp', False)
+            if fast_rsvp:
+                gc.disable()
+            try:
+                sequence_completed = self.run_sequence(sequence_info)
+            finally:
+                if fast_rsvp:
+                    gc.enable()
+            if not sequence_completed:
+                print("Experiment cancelled during sequence")
+                completed = False
+                break
+        
+        # Flush queued pulses so their on/off times are saved
+        if self.pulse_worker:
+            self.pulse_worker.stop()
+            print(f"Pulses sent: {self.pulse_worker.summary()}")
+            self.log_event('pulses', records=list(self.pulse_worker.records))
+        
+        return completed
+    
+    def calculate_summary(self):
+        """Summary statistics of the responses so far (kept up to date by record_response)
+        
+        With the lines task, correct responses are hits on a line color
+        change; hits, misses, false alarms and the reaction times of hits
+        are added once a change has been shown or a response recorded.
+        The summary is a snapshot taken under stats_lock, so it can be read
+        from another thread while a run updates the statistics.
+        """
+        with self.stats_lock:
+            summary = self.response_stats.summary()
+            if not self.config.get('lines_task', True) or not (summary or self.line_changes_shown):
+                return summary
+            
+            hits = summary.get('correct_responses', 0)
+            has_hits = self.hit_reaction_times.n > 0
+            summary.update({
+                'line_changes': self.line_changes_shown,
+                'hits': hits,
+                'misses': max(self.line_changes_shown - hits, 0),
+                'false_alarms': summary.get('total_responses', 0) - hits,
+                'hit_rate': hits / self.line_changes_shown * 100 if self.line_changes_shown else None,
+                'mean_hit_reaction_time': self.hit_reaction_times.mean if has_hits else None,
+                'median_hit_reaction_time': self.hit_reaction_times.median if has_hits else None
+            })
+            return summary
     
     def run_experiment(self, environment=None):
         """Run the complete RSVP experiment"""
         try:
             print("Starting RSVP Experiment")
             print("=" * 50)
+            startup_start = time.perf_counter()
+            
+            # One wall-clock anchor per session for every timestamp
+            session_clock.anchor()
+            
+            # Decode images and generate trials in the background while the
+            # experimenter fills in the dialog and the participant reads the
+            # instructions (only the texture upload needs the window thread)
+            loader_pool = ThreadPoolExecutor(max_workers=1)
+            stimuli_future = loader_pool.submit(self.prepare_stimuli)
+            loader_pool.shutdown(wait=False)
             
             # Get participant information
+            phase_start = time.perf_counter()
             participant_info = self.get_participant_info(environment)
+            self.log_phase('participant_dialog', phase_start)
             if not participant_info:
                 print("Experiment cancelled - no participant info")
                 return False
             
+            # Events are logged as they happen, so a crash does not lose the session
+            self.start_event_log(participant_info)
+            
             # Setup experiment
             print("Setting up experiment...")
+            phase_start = time.perf_counter()
             self.setup_window()
-            self.load_images()
-            self.generate_trial_structure()
+            self.log_phase('window_setup', phase_start)
             
             # Run screening if enabled
             if self.config.get('enable_screening', False):
-                print("Running screening battery...")
-                self.screening.run_screening_battery()
+                phase_start = time.perf_counter()
+                if self.config.get('screening_mode', 'full') == 'fast':
+                    print("Running fast screening...")
+                    self.screening_report = self.screening.run_fast_screening(
+                        expected_ifi=self.ifi,
+                        cache_path=self.config.get('screening_cache', 'experiment_data/screening_cache.json'),
+                        skip_passed=self.config.get('screening_skip_passed', True)
+                    )
+                    self.log_event('screening', **self.screening_report)
+                    if not self.screening_report['passed']:
+                        print("⚠️  Screening failed, check the report above")
+                else:
+                    print("Running screening battery...")
+                    self.screening.run_screening_battery()
+                self.log_phase('screening', phase_start)
+            
+            # Display timing against this machine's baseline, before the instructions
+            if self.config.get('display_benchmark', False):
+                phase_start = time.perf_counter()
+                regressions = self.run_display_benchmark()['baseline']['regressions']
+                self.log_phase('display_benchmark', phase_start)
+                if regressions and self.config.get('benchmark_abort_on_regression', False):
+                    print("Experiment not started: display timing regressed")
+                    return False
             
             # Show instructions
+            phase_start = time.perf_counter()
             if not self.show_instructions():
                 print("Experiment cancelled during instructions")
                 return False
+            self.log_phase('instructions', phase_start)
+            
+            # Wait for background loading, then create textures on this thread
+            phase_start = time.perf_counter()
+            decoded_images = stimuli_future.result()
+            self.log_phase('wait_for_stimuli', phase_start)
+            self.check_stimulus_size()
             
-            # Send experiment signature pulses at start (matching MATLAB)
-            if self.pulse_gen and self.pulse_gen.available:
-                print("Sending experiment signature pulses...")
-                self.pulse_gen.send_signature_pulses()
+            phase_start = time.perf_counter()
+            self.create_textures(decoded_images)
+            self.log_phase('texture_setup', phase_start)
+            
+            # Stimulus ids, onsets and pulse codes of every sequence
+            phase_start = time.perf_counter()
+            self.compile_timelines()
+            self.log_phase('compile_timelines', phase_start)
+            self.log_phase('total_startup', startup_start)
             
             # Run sequences
-            for sequence_info in self.trial_structure:
-                # Show ready message
-                if not self.show_message('ready_continue'):
-                    print("Experiment cancelled by user")
-                    break
-                
-                # Run sequence
-                if not self.run_sequence(sequence_info):
-                    print("Experiment cancelled during sequence")
-                    break
+            self.run_sequences()
             
             # Save data
             print("Saving experimental data...")
@@ -721,6 +1429,8 @@ Press any key to exit."""
                 wrapWidth=600
             )
             
+            # Keys left over from the sequences do not count
+            event.clearEvents()
             while True:
                 keys = event.getKeys()
                 if keys:
@@ -737,8 +1447,21 @@ Press any key to exit."""
             return False
         
         finally:
+            # Let queued pulses go out before the DAQ is released
+            if self.pulse_worker:
+                self.pulse_worker.stop()
+            if self.telemetry:
+                self.telemetry.stop()
+            
+            # Records logged before an error are written, synced and indexed
+            if self.event_log:
+                self.event_log.finalize(complete=False)
+                self.event_log = None
+            
             # Cleanup hardware
-            if self.hardware:
+            if self.hardware_session:
+                self.hardware_session.close()
+            elif self.hardware:
                 cleanup_hardware(self.hardware)
             
             # Cleanup window
@@ -4,29 +4,84 @@ RSVP Hardware Integration Module
 
 This module provides hardware integration for the RSVP experiment including:
 - Gamepad/joystick support
+- Background gamepad sampling into a timestamped ring buffer
+- Timestamped keyboard input (psychopy.hardware.keyboard)
 - DAQ pulse generation for EEG synchronization
-- Hardware testing functions
+- Pluggable trigger backends (MCC DAQ, TCP/UDP socket stream, file mock)
+- Non-blocking pulse output on a dedicated worker thread
+- Hardware testing functions, including a concurrent fast screening
 
 Dependencies:
-- pygame (for gamepad support)
-- mcculw (for MCC USB-1208FS-Plus DAQ - optional)
+- pygame (for gamepad support, imported when a gamepad is initialized)
+- mcculw (for MCC USB-1208FS-Plus DAQ - optional, imported when the DAQ is used)
 - psychopy
 """
 
-import pygame
+import os
+import sys
+import json
 import time
+import queue
+import socket
+import struct
+from abc import ABC, abstractmethod
+import threading
 import numpy as np
 from psychopy import core, event
 import warnings
+from datetime import datetime
+from rsvp_timing import session_clock
 
-# Optional DAQ support - MCC USB-1208FS-Plus
-try:
-    from mcculw import ul
-    from mcculw.enums import DigitalPortType, DigitalIODirection, InterfaceType
-    DAQ_AVAILABLE = True
-except ImportError:
-    DAQ_AVAILABLE = False
-    warnings.warn("mcculw not available. Pulse functionality will be disabled.")
+# pygame and mcculw are imported on first use: a lab run needs neither
+pygame = None
+
+# Optional DAQ support - MCC USB-1208FS-Plus (None until load_mcculw is called)
+DAQ_AVAILABLE = None
+ul = DigitalPortType = DigitalIODirection = InterfaceType = None
+DAQ_INVENTORY = None  # MCC devices, enumerated once per process
+
+def load_pygame():
+    """Import pygame (raises ImportError if it is not installed)"""
+    global pygame
+    if pygame is None:
+        import pygame
+    return pygame
+
+def load_mcculw():
+    """Import mcculw once, returns True if the MCC DAQ library is available"""
+    global DAQ_AVAILABLE, ul, DigitalPortType, DigitalIODirection, InterfaceType
+    if DAQ_AVAILABLE is None:
+        try:
+            from mcculw import ul
+            from mcculw.enums import DigitalPortType, DigitalIODirection, InterfaceType
+            DAQ_AVAILABLE = True
+        except ImportError:
+            DAQ_AVAILABLE = False
+            warnings.warn("mcculw not available. Pulse functionality will be disabled.")
+    return DAQ_AVAILABLE
+
+def get_daq_inventory(refresh=False):
+    """MCC DAQ devices on any interface (enumerated on first call, then cached)"""
+    global DAQ_INVENTORY
+    if DAQ_INVENTORY is None or refresh:
+        ul.ignore_instacal()
+        DAQ_INVENTORY = ul.get_daq_device_inventory(InterfaceType.ANY)
+    return DAQ_INVENTORY
+
+# Pulse codes from original MATLAB code
+PULSE_CODES = {
+    'data_signature_on': 85,
+    'data_signature_off': 84,
+    'pic_onoff_1': [1, 5, 17],
+    'pic_onoff_2': [3, 9, 33],
+    'blank_on': 69,
+    'trial_on': 113,
+    'resp_offset': 81,
+    'lines_onoff': 77,
+    'lines_flip_pic': 133,
+    'lines_flip_blank': 103,
+    'value_reset': 0
+}
 
 class GamepadController:
     """Gamepad/Joystick controller for RSVP experiment"""
@@ -44,9 +99,18 @@ class GamepadController:
             'button_3': 2,  # B button
             'button_4': 3,  # Y button
         }
+        
+        # Button sampler (owns pygame.event.pump while running)
+        self.sampler = None
     
     def initialize(self):
         """Initialize pygame and detect gamepad"""
+        try:
+            load_pygame()
+        except ImportError:
+            print("Gamepad support not available (pygame missing)")
+            return False
+        
         try:
             pygame.init()
             pygame.joystick.init()
@@ -79,6 +143,10 @@ class GamepadController:
         if not self.connected:
             return False
         
+        # The sampler keeps the latest state of every button
+        if self.sampling():
+            return bool(self.sampler.sample()[button_number])
+        
         try:
             pygame.event.pump()  # Update joystick state
             return self.gamepad.get_button(button_number)
@@ -86,11 +154,19 @@ class GamepadController:
             print(f"Error reading button {button_number}: {e}")
             return False
     
+    def sampling(self):
+        """True while the sampler runs (it is then the only caller of pygame.event.pump)"""
+        return bool(self.sampler and self.sampler.running)
+    
     def get_all_buttons(self):
         """Get the state of all buttons"""
         if not self.connected:
             return []
         
+        # The sampler keeps the latest state of every button
+        if self.sampling():
+            return self.sampler.sample().tolist()
+        
         try:
             pygame.event.pump()
             return [self.gamepad.get_button(i) for i in range(self.num_buttons)]
@@ -103,18 +179,16 @@ class GamepadController:
         if not self.connected:
             return None
         
-        start_time = time.time()
+        start_time = session_clock.now()
         
         while True:
-            pygame.event.pump()
-            
-            # Check all buttons
-            for i in range(self.num_buttons):
-                if self.gamepad.get_button(i):
+            # Check all buttons (through the sampler while it runs)
+            for i, state in enumerate(self.get_all_buttons()):
+                if state:
                     return i
             
             # Check timeout
-            if timeout and (time.time() - start_time) > timeout:
+            if timeout and (session_clock.now() - start_time) > timeout:
                 return None
             
             time.sleep(0.001)  # Small delay to prevent excessive CPU usage
@@ -136,7 +210,6 @@ class GamepadController:
                 break
             
             # Check gamepad buttons
-            pygame.event.pump()
             button_states = self.get_all_buttons()
             
             # Print button states if any are pressed
@@ -150,89 +223,514 @@ class GamepadController:
         print("Gamepad test completed")
         return True
     
+    def probe(self):
+        """Non-blocking gamepad check: connected, enough buttons, none held down"""
+        if not self.connected:
+            return {'passed': False, 'error': 'no gamepad connected'}
+        
+        # While the sampler runs it is the only caller of pygame.event.pump
+        button_states = self.get_all_buttons()
+        required_buttons = max(self.button_map.values()) + 1
+        held_buttons = [i for i, state in enumerate(button_states) if state]
+        
+        return {
+            'passed': len(button_states) >= required_buttons and not held_buttons,
+            'name': self.gamepad_name,
+            'n_buttons': len(button_states),
+            'required_buttons': required_buttons,
+            'held_buttons': held_buttons  # A button held down now is likely stuck
+        }
+    
+    def start_sampler(self, rate=1000.0, capacity=1024):
+        """Start sampling the buttons on the calling thread (see GamepadSampler)"""
+        if not self.connected:
+            return None
+        if self.sampler is None:
+            self.sampler = GamepadSampler(self, rate=rate, capacity=capacity)
+        self.sampler.start()
+        return self.sampler
+    
     def cleanup(self):
         """Clean up pygame resources"""
+        if self.sampler:
+            self.sampler.stop()
         if self.connected and self.gamepad:
             self.gamepad.quit()
-        pygame.joystick.quit()
-        pygame.quit()
+        if pygame is not None:
+            pygame.joystick.quit()
+            pygame.quit()
         self.connected = False
 
-class PulseGenerator:
-    """DAQ pulse generator for EEG synchronization - MCC USB-1208FS-Plus"""
+class GamepadSampler:
+    """Sample all gamepad buttons on the thread that initialized pygame
     
-    def __init__(self, device_name=None, port="FIRSTPORTA"):
-        self.device_name = device_name
-        self.port = port
-        self.board_num = 0  # Default board number for MCC devices
-        self.available = DAQ_AVAILABLE
-        
-        # Pulse codes from original MATLAB code (simplified - images only)
-        self.pulse_codes = {
-            'data_signature_on': 85,
-            'data_signature_off': 84,
-            'pic_onoff_1': [1, 5, 17],
-            'pic_onoff_2': [3, 9, 33],
-            'blank_on': 69,
-            'trial_on': 113,
-            'resp_offset': 81,
-            'value_reset': 0
-        }
+    SDL only pumps events reliably on the thread that initialized it, so
+    the buttons are sampled on that (main) thread: sample() is called at
+    every input poll, between flips, at most `rate` times per second.
+    Press and release edges are written with their session_clock timestamp
+    into a ring buffer of NumPy arrays and read back with drain(). Other
+    threads (screening) only read `state`, the buttons at the last sample.
+    When the buffer is full new edges are dropped and counted in `overflows`.
+    """
+    
+    def __init__(self, controller, rate=1000.0, capacity=1024):
+        self.controller = controller
+        self.interval = 1.0 / rate
+        self.capacity = capacity
         
-        self.wait_reset = 0.04  # Wait time after pulse
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.buttons = np.zeros(capacity, dtype=np.int16)
+        self.pressed = np.zeros(capacity, dtype=np.bool_)
+        self.head = 0  # Edges written
+        self.tail = 0  # Edges read
+        
+        self.state = np.zeros(controller.num_buttons, dtype=np.bool_)
+        self.n_samples = 0
+        self.overflows = 0
+        self.running = False
+        self.owner = None  # Thread that samples (the one that called start)
+        self.last_sample = None
+    
+    def start(self):
+        """Start sampling on the calling thread (the one that initialized pygame)"""
+        self.owner = threading.get_ident()
+        self.running = True
+        self.sample()
+    
+    def stop(self):
+        """Stop sampling"""
+        self.running = False
+    
+    def sample(self):
+        """Read every button and push the edges, returns the button state
+        
+        Only the owner thread pumps pygame events; other threads get the
+        state of the last sample.
+        """
+        if not self.running or threading.get_ident() != self.owner:
+            return self.state
+        
+        now = session_clock.now()
+        if self.last_sample is not None and now - self.last_sample < self.interval:
+            return self.state
+        
+        try:
+            pygame.event.pump()
+            sample_time = session_clock.now()
+            state = np.array([self.controller.gamepad.get_button(i) for i in range(self.controller.num_buttons)],
+                             dtype=np.bool_)
+        except Exception as e:
+            print(f"Gamepad sampler stopped: {e}")
+            self.running = False
+            return self.state
+        
+        self.last_sample = sample_time
+        self.n_samples += 1
+        for button in np.flatnonzero(state != self.state):
+            self._push(sample_time, button, state[button])
+        self.state = state
+        return state
+    
+    def _push(self, sample_time, button, pressed):
+        """Write one edge"""
+        if self.head - self.tail >= self.capacity:
+            self.overflows += 1
+            return
+        slot = self.head % self.capacity
+        self.times[slot] = sample_time
+        self.buttons[slot] = button
+        self.pressed[slot] = pressed
+        self.head += 1  # Publish the edge after its slot is written
+    
+    def drain(self):
+        """Sample, then return the edges since the last drain as a list of (time, button, pressed)"""
+        self.sample()
+        head = self.head
+        edges = []
+        for position in range(self.tail, head):
+            slot = position % self.capacity
+            edges.append((float(self.times[slot]), int(self.buttons[slot]), bool(self.pressed[slot])))
+        self.tail = head
+        return edges
+    
+    def clear(self):
+        """Discard the edges not drained yet"""
+        self.tail = self.head
+    
+    def stats(self):
+        """Sampling statistics"""
+        return {'samples': self.n_samples, 'edges': self.head, 'overflows': self.overflows,
+                'rate': 1.0 / self.interval}
+
+class KeyboardInput:
+    """Keyboard responses with key-down timestamps
+    
+    backend 'psychopy' uses psychopy.hardware.keyboard (an event queue with
+    the time every key went down); backend 'event' uses event.getKeys(),
+    which only tells which keys were pressed since the last poll (no time).
+    Times are on the session clock.
+    """
+    
+    def __init__(self, backend='psychopy', key_list=('space', 'escape')):
+        self.backend = backend
+        self.key_list = list(key_list)
+        self.keyboard = None
+        self.clock = None
     
     def initialize(self):
-        """Initialize MCC USB-1208FS-Plus DAQ device"""
-        if not self.available:
-            print("DAQ not available - pulse generation disabled")
-            return False
+        """Create the keyboard device (falls back to event.getKeys if unavailable)"""
+        if self.backend == 'psychopy':
+            try:
+                from psychopy.hardware import keyboard
+                self.clock = session_clock.monotonic
+                self.keyboard = keyboard.Keyboard(clock=self.clock)
+                self.keyboard.clearEvents()
+            except Exception as e:
+                print(f"Timestamped keyboard not available ({e}), using event.getKeys")
+                self.backend = 'event'
+        
+        print(f"Keyboard backend: {self.backend}")
+        return True
+    
+    def get_presses(self):
+        """Keys pressed since the last call, as a list of (name, key-down time or None)"""
+        if self.keyboard is None:
+            return [(name, None) for name in event.getKeys(keyList=self.key_list)]
         
+        # key.rt is the key-down time on the session clock
+        return [(key.name, key.rt)
+                for key in self.keyboard.getKeys(keyList=self.key_list, waitRelease=False, clear=True)]
+    
+    def clear(self):
+        """Discard the pending key presses"""
+        if self.keyboard is None:
+            event.clearEvents(eventType='keyboard')
+        else:
+            self.keyboard.clearEvents()
+
+# Socket trigger record: sequence number, session clock time, pulse code
+TRIGGER_RECORD = struct.Struct('<IdH')
+
+# Codes of test_pulses.m, also used by the fast pulse loopback
+TEST_PULSE_VALUES = [1, 2, 5, 8, 17, 32, 65, 128, 85, 84, 4, 16, 0]
+
+# Checks of the fast screening that passed today, per machine
+SCREENING_CACHE_FILE = 'experiment_data/screening_cache.json'
+
+class TriggerBackend(ABC):
+    """Output of trigger codes (abstract base class)
+    
+    Subclasses implement _send, and _open and _close when the output needs
+    them. write() times every send so each backend reports its measured
+    send latency.
+    """
+    
+    name = 'none'
+    
+    def __init__(self):
+        self.available = True
+        self.latencies = []
+    
+    def open(self):
+        """Open the output, returns True on success"""
         try:
-            # Initialize the Universal Library
-            ul.ignore_instacal()
-            
-            # Get the first available board (USB-1208FS-Plus)
-            board_list = ul.get_daq_device_inventory(InterfaceType.USB)
-            if not board_list:
-                print("No MCC DAQ devices found")
-                return False
-            
-            # Use board number 0 (default for InstaCal configuration)
-            # The device should be configured in InstaCal first
-            self.board_num = 0
-            self.config_first_detected_device(self.board_num)
-            # Configure digital port for output (matching MATLAB: DaqDConfigPort(dio,0,0))
-            # MATLAB: dio=board, 0=port A, 0=output direction
-            ul.d_config_port(self.board_num, DigitalPortType.FIRSTPORTA, DigitalIODirection.OUT)
-            
-            print(f"MCC DAQ initialized: Board {self.board_num}")
-            return True
-            
+            self.available = self._open()
         except Exception as e:
-            print(f"Error initializing MCC DAQ: {e}")
+            print(f"Error opening {self.name} trigger backend: {e}")
             self.available = False
+        return self.available
+    
+    def write(self, value):
+        """Output a code, returns the session time the send completed"""
+        start_time = session_clock.now()
+        self._send(value, start_time)
+        end_time = session_clock.now()
+        self.latencies.append(end_time - start_time)
+        return end_time
+    
+    def close(self):
+        """Close the output"""
+        try:
+            self._close()
+        except Exception:
+            pass
+    
+    def read(self):
+        """Code currently on the output, or None if the backend cannot read it back"""
+        return None
+    
+    def device(self):
+        """Description of the output device (backend and where it writes)"""
+        return self.name
+    
+    def latency(self):
+        """Measured send latency (seconds)"""
+        if not self.latencies:
+            return {'backend': self.name, 'n_sends': 0}
+        latencies = np.array(self.latencies)
+        return {
+            'backend': self.name,
+            'n_sends': int(latencies.size),
+            'mean': float(latencies.mean()),
+            'p95': float(np.percentile(latencies, 95)),
+            'max': float(latencies.max())
+        }
+    
+    def _open(self):
+        return True
+    
+    @abstractmethod
+    def _send(self, value, send_time):
+        """Output one code (send_time: session time the send started)"""
+    
+    def _close(self):
+        pass
+
+class MCCTriggerBackend(TriggerBackend):
+    """Digital port A of an MCC USB-1208FS-Plus (mcculw)"""
+    
+    name = 'mcc'
+    
+    def __init__(self, board_num=0):
+        super().__init__()
+        self.board_num = board_num  # Default board number for MCC devices
+        self.available = load_mcculw()
+    
+    def _open(self):
+        """Initialize MCC USB-1208FS-Plus DAQ device"""
+        if not load_mcculw():
+            print("DAQ not available - pulse generation disabled")
             return False
+        
+        # Get the first available board (USB-1208FS-Plus), one enumeration per process
+        devices = get_daq_inventory()
+        if not devices:
+            print("No MCC DAQ devices found")
+            return False
+        
+        # Use board number 0 (default for InstaCal configuration)
+        # The device should be configured in InstaCal first
+        self.config_first_detected_device(self.board_num, devices=devices)
+        # Configure digital port for output (matching MATLAB: DaqDConfigPort(dio,0,0))
+        # MATLAB: dio=board, 0=port A, 0=output direction
+        ul.d_config_port(self.board_num, DigitalPortType.FIRSTPORTA, DigitalIODirection.OUT)
+        
+        print(f"MCC DAQ initialized: Board {self.board_num}")
+        return True
+    
+    def _send(self, value, send_time):
+        ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, value)
+    
+    def read(self):
+        # Reading an output port returns the levels on its lines
+        return ul.d_in(self.board_num, DigitalPortType.FIRSTPORTA)
+    
+    def device(self):
+        return f"mcc board {self.board_num}"
+    
+    def _close(self):
+        # Reset digital port to 0
+        if self.available:
+            ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, 0)
+    
+    def config_first_detected_device(self, board_num, dev_id_list=None, devices=None):
+        """Adds the first available device to the UL.  If a types_list is specified,
+        the first available device in the types list will be add to the UL.
+
+        Parameters
+        ----------
+        board_num : int
+            The board number to assign to the board when configuring the device.
+
+        dev_id_list : list[int], optional
+            A list of product IDs used to filter the results. Default is None.
+            See UL documentation for device IDs.
+
+        devices : list, optional
+            Device inventory already enumerated. Default is the cached inventory.
+        """
+        if devices is None:
+            devices = get_daq_inventory()
+        if not devices:
+            raise Exception('Error: No DAQ devices found')
+
+        print('Found', len(devices), 'DAQ device(s):')
+        for device in devices:
+            print('  ', device.product_name, ' (', device.unique_id, ') - ',
+                  'Device ID = ', device.product_id, sep='')
+
+        device = devices[0]
+        if dev_id_list:
+            device = next((device for device in devices
+                           if device.product_id in dev_id_list), None)
+            if not device:
+                err_str = 'Error: No DAQ device found in device ID list: '
+                err_str += ','.join(str(dev_id) for dev_id in dev_id_list)
+                raise Exception(err_str)
+
+        # Add the first DAQ device to the UL with the specified board number
+        ul.create_daq_device(board_num, device)
+
+class SocketTriggerBackend(TriggerBackend):
+    """Stream codes as binary TRIGGER_RECORDs to a recorder over TCP or UDP"""
+    
+    name = 'socket'
+    
+    def __init__(self, host='127.0.0.1', port=5005, protocol='udp'):
+        super().__init__()
+        self.address = (host, port)
+        self.protocol = protocol
+        self.sock = None
+        self.sequence = 0
+        self.pending = b''  # Rest of a record partially sent (TCP)
+    
+    def _open(self):
+        if self.protocol == 'tcp':
+            self.sock = socket.create_connection(self.address, timeout=2.0)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Sends never wait: a stalled recorder must not hold up the flip
+            self.sock.setblocking(False)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect(self.address)
+        print(f"Trigger stream: {self.protocol.upper()} {self.address[0]}:{self.address[1]}")
+        return True
+    
+    def _send(self, value, send_time):
+        record = TRIGGER_RECORD.pack(self.sequence, send_time, value)
+        self.sequence += 1
+        if self.protocol != 'tcp':
+            self.sock.send(record)
+            return
+        
+        # Whole records only: a partially sent record is completed first
+        self.pending += record
+        try:
+            sent = self.sock.send(self.pending)
+        except BlockingIOError:
+            # Recorder stalled: this code is lost and reported as a failed write
+            self.pending = self.pending[:-len(record)]
+            raise
+        self.pending = self.pending[sent:]
+    
+    def device(self):
+        return f"socket {self.protocol} {self.address[0]}:{self.address[1]}"
+    
+    def _close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+class FileTriggerBackend(TriggerBackend):
+    """Append codes to a text file (sequence, session time, code), for tests without hardware"""
+    
+    name = 'file'
+    
+    def __init__(self, path='experiment_data/triggers.log'):
+        super().__init__()
+        self.path = path
+        self.file = None
+        self.sequence = 0
+    
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'a', buffering=1)
+        print(f"Trigger file: {self.path}")
+        return True
+    
+    def _send(self, value, send_time):
+        self.file.write(f"{self.sequence}\t{send_time:.6f}\t{value}\n")
+        self.sequence += 1
+    
+    def device(self):
+        return f"file {self.path}"
+    
+    def _close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def create_trigger_backend(config):
+    """Trigger backend selected by config['trigger_backend'] ('mcc', 'socket' or 'file')"""
+    backend = config.get('trigger_backend', 'mcc')
+    if backend == 'socket':
+        return SocketTriggerBackend(
+            host=config.get('trigger_host', '127.0.0.1'),
+            port=config.get('trigger_port', 5005),
+            protocol=config.get('trigger_protocol', 'udp')
+        )
+    if backend == 'file':
+        return FileTriggerBackend(config.get('trigger_file', 'experiment_data/triggers.log'))
+    return MCCTriggerBackend()
+
+def decode_trigger_records(data):
+    """Decode a buffer of TRIGGER_RECORDs into (sequence, time, code) tuples"""
+    usable = len(data) - len(data) % TRIGGER_RECORD.size
+    return list(TRIGGER_RECORD.iter_unpack(data[:usable]))
+
+class PulseGenerator:
+    """Pulse generator for EEG synchronization
+    
+    Pulse codes, pulse width and port locking are handled here; the codes
+    are output by a TriggerBackend (MCC USB-1208FS-Plus by default).
+    """
+    
+    def __init__(self, device_name=None, port="FIRSTPORTA", backend=None):
+        self.device_name = device_name
+        self.port = port
+        self.backend = backend if backend is not None else MCCTriggerBackend()
+        self.available = self.backend.available
+        
+        self.pulse_codes = dict(PULSE_CODES)
+        
+        self.wait_reset = 0.04  # Wait time after pulse
+        
+        # Port writes may come from the render thread (flip-locked pulses)
+        # and from the pulse worker, so they are serialized
+        self.lock = threading.Lock()
+        self.last_write_time = None
+    
+    def initialize(self):
+        """Open the trigger backend"""
+        self.available = self.backend.open()
+        return self.available
     
     def send_pulse(self, value):
         """Send a digital pulse with specified value (matching MATLAB exactly)"""
+        return self.emit(value) is not None
+    
+    def emit(self, value):
+        """Send a pulse and return its (on_time, off_time), or None on failure"""
+        # Send pulse (matching MATLAB: err=DaqDOut(dio,0,value))
+        on_time = self.set_value(value)
+        if on_time is None:
+            return None
+        
+        # Wait (matching MATLAB: WaitSecs(wait_reset))
+        session_clock.wait_until(on_time + self.wait_reset)
+        
+        # Reset (matching MATLAB: fff=DaqDOut(dio,0,value_reset))
+        off_time = self.set_value(self.pulse_codes['value_reset'])
+        
+        return on_time, off_time
+    
+    def set_value(self, value):
+        """Write a value to the port without waiting, returns the write time or None"""
         if not self.available:
-            return False
+            return None
         
         try:
-            # Send pulse (matching MATLAB: err=DaqDOut(dio,0,value))
-            ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, value)
-            
-            # Wait (matching MATLAB: WaitSecs(wait_reset))
-            time.sleep(self.wait_reset)
-            
-            # Reset (matching MATLAB: fff=DaqDOut(dio,0,value_reset))
-            ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, self.pulse_codes['value_reset'])
-            
-            return True
+            with self.lock:
+                write_time = self.backend.write(value)
+                if value != self.pulse_codes['value_reset']:
+                    self.last_write_time = write_time
+            return write_time
             
         except Exception as e:
             print(f"Error sending pulse {value}: {e}")
-            return False
+            return None
     
     def send_signature_pulses(self):
         """Send experiment start signature (3 pulses matching MATLAB exactly)"""
@@ -242,11 +740,13 @@ class PulseGenerator:
         try:
             for _ in range(3):
                 # Send signature on pulse
-                ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, self.pulse_codes['data_signature_on'])
+                with self.lock:
+                    self.backend.write(self.pulse_codes['data_signature_on'])
                 time.sleep(0.05)
                 
                 # Send signature off pulse
-                ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, self.pulse_codes['data_signature_off'])
+                with self.lock:
+                    self.backend.write(self.pulse_codes['data_signature_off'])
                 time.sleep(0.45)
             
             return True
@@ -261,7 +761,7 @@ class PulseGenerator:
             print("DAQ not available for pulse testing")
             return False
         
-        test_values = [1, 2, 5, 8, 17, 32, 65, 128, 85, 84, 4, 16, 0]
+        test_values = TEST_PULSE_VALUES
         
         print("Testing pulse generation...")
         print(f"Sending test values: {test_values}")
@@ -274,49 +774,212 @@ class PulseGenerator:
         print("Pulse test completed")
         return True
     
-    def config_first_detected_device(self, board_num, dev_id_list=None):
-        """Adds the first available device to the UL.  If a types_list is specified,
-        the first available device in the types list will be add to the UL.
-
-        Parameters
-        ----------
-        board_num : int
-            The board number to assign to the board when configuring the device.
-
-        dev_id_list : list[int], optional
-            A list of product IDs used to filter the results. Default is None.
-            See UL documentation for device IDs.
+    def loopback_test(self, values=TEST_PULSE_VALUES, settle=0.001):
+        """Fast pulse check: write each test code and read it back (no 0.4 s pauses)
+        
+        Codes are compared with what the backend reads back from its output;
+        backends that cannot read back only check that every write succeeded.
         """
-        ul.ignore_instacal()
-        devices = ul.get_daq_device_inventory(InterfaceType.ANY)
-        if not devices:
-            raise Exception('Error: No DAQ devices found')
-
-        print('Found', len(devices), 'DAQ device(s):')
-        for device in devices:
-            print('  ', device.product_name, ' (', device.unique_id, ') - ',
-                  'Device ID = ', device.product_id, sep='')
-
-        device = devices[0]
-        if dev_id_list:
-            device = next((device for device in devices
-                           if device.product_id in dev_id_list), None)
-            if not device:
-                err_str = 'Error: No DAQ device found in device ID list: '
-                err_str += ','.join(str(dev_id) for dev_id in dev_id_list)
-                raise Exception(err_str)
-
-        # Add the first DAQ device to the UL with the specified board number
-        ul.create_daq_device(board_num, device)
+        if not self.available:
+            return {'passed': False, 'error': f"{self.backend.name} trigger backend not available"}
+        
+        failed = []
+        n_verified = 0
+        for value in values:
+            write_time = self.set_value(value)
+            if write_time is None:
+                failed.append(value)
+                continue
+            
+            session_clock.wait_until(write_time + settle)
+            try:
+                read_value = self.backend.read()
+            except Exception as e:
+                print(f"Error reading back pulse {value}: {e}")
+                failed.append(value)
+                continue
+            if read_value is not None:
+                n_verified += 1
+                if read_value != value:
+                    failed.append(value)
+        
+        self.set_value(self.pulse_codes['value_reset'])
+        
+        return {
+            'passed': not failed,
+            'backend': self.backend.name,
+            'n_codes': len(values),
+            'n_verified': n_verified,  # Codes actually read back
+            'failed_codes': failed,
+            'latency': self.latency()
+        }
+    
+    def latency(self):
+        """Measured send latency of the trigger backend"""
+        return self.backend.latency()
     
     def cleanup(self):
-        """Clean up DAQ resources"""
-        if self.available:
+        """Clean up trigger backend resources"""
+        self.backend.close()
+
+class PulseWorker:
+    """Dedicated thread that outputs queued pulses so the render loop never blocks
+    
+    Each pulse is queued with its scheduled time (on the session clock).
+    The worker waits until that time, writes the value through the
+    PulseGenerator, resets the line wait_reset later and records when the
+    line actually went on and off. on_error(record) is called (on the
+    worker thread) for every pulse that could not be written.
+    """
+    
+    def __init__(self, pulse_gen, on_error=None):
+        self.pulse_gen = pulse_gen
+        self.on_error = on_error
+        self.queue = queue.Queue()
+        self.records = []
+        self.unsent = 0  # Pulses and resets still queued when stop gave up
+        self.thread = None
+    
+    def start(self):
+        """Start the worker thread"""
+        self.thread = threading.Thread(target=self._run, name='PulseWorker', daemon=True)
+        self.thread.start()
+    
+    def submit(self, value, when=None):
+        """Queue a pulse for output at time `when` (default: as soon as possible)"""
+        queued = session_clock.now()
+        scheduled = queued if when is None else when
+        self.queue.put((value, scheduled, queued))
+    
+    def submit_reset(self, record):
+        """Queue the reset of a pulse written elsewhere (record with its 'on' time)
+        
+        The line is reset wait_reset after record['on'] and the time it went
+        off is written to record['off'].
+        """
+        self.queue.put((None, record['on'] + self.pulse_gen.wait_reset, record))
+    
+    def stop(self, timeout=2.0):
+        """Output the pulses still queued, then stop the worker
+        
+        Waits for the queue to drain (at most timeout seconds after the last
+        scheduled pulse). Returns the number of pulses and resets left
+        unsent, which is also reported and kept in `unsent`.
+        """
+        if self.thread is None:
+            return 0
+        self.queue.put(None)
+        self.thread.join(max(0.0, self.last_scheduled() - session_clock.now()) + timeout)
+        if self.thread.is_alive():
+            self.unsent = max(0, self.queue.qsize() - 1)  # Not counting the stop marker
+            print(f"Warning: pulse worker did not finish, {self.unsent} queued pulses or resets "
+                  f"were not sent (their on/off times are missing)")
+        self.thread = None
+        return self.unsent
+    
+    def last_scheduled(self):
+        """Latest scheduled time of the items still queued (now if none)"""
+        with self.queue.mutex:
+            items = list(self.queue.queue)
+        times = [item[1] for item in items if item is not None]
+        return max(times, default=session_clock.now())
+    
+    def _run(self):
+        """Worker loop: wait for the scheduled time, then output the pulse
+        
+        The reset of a pulse is not waited for: the worker keeps taking new
+        pulses and resets the line wait_reset after the pulse went on, so
+        pulses can follow each other faster than wait_reset + queue latency.
+        """
+        raise_thread_priority()
+        pending = None  # Record of the pulse whose reset is due
+        
+        while True:
+            timeout = None
+            if pending is not None:
+                timeout = max(0.0, pending['on'] + self.pulse_gen.wait_reset - session_clock.now())
+            
             try:
-                # Reset digital port to 0
-                ul.d_out(self.board_num, DigitalPortType.FIRSTPORTA, 0)
-            except:
-                pass
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._reset(pending)
+                pending = None
+                continue
+            
+            if item is None:
+                if pending is not None:
+                    self._reset(pending)
+                break
+            
+            value, scheduled, queued = item
+            session_clock.wait_until(scheduled)
+            
+            if value is None:
+                # Reset of a flip-locked pulse (queued is its record), unless a
+                # newer pulse replaced it: that pulse ended it
+                record = queued
+                if self.pulse_gen.last_write_time is None or self.pulse_gen.last_write_time <= record['on']:
+                    record['off'] = self.pulse_gen.set_value(self.pulse_gen.pulse_codes['value_reset'])
+                else:
+                    record['off'] = self.pulse_gen.last_write_time
+                continue
+            
+            on_time = self.pulse_gen.set_value(value)
+            record = {
+                'value': value,
+                'queued': queued,
+                'scheduled': scheduled,
+                'on': on_time,
+                'off': None,
+                'latency': on_time - scheduled if on_time is not None else None
+            }
+            self.records.append(record)
+            if on_time is None and self.on_error:
+                self.on_error(record)
+            
+            # A pulse written before the previous reset ends the previous pulse
+            if pending is not None:
+                pending['off'] = on_time
+            pending = record if on_time is not None else None
+    
+    def _reset(self, record):
+        """Reset the line wait_reset after a pulse went on"""
+        session_clock.wait_until(record['on'] + self.pulse_gen.wait_reset)
+        record['off'] = self.pulse_gen.set_value(self.pulse_gen.pulse_codes['value_reset'])
+    
+    def summary(self):
+        """Latency statistics of the pulses sent so far"""
+        latencies = np.array([r['latency'] for r in self.records if r['latency'] is not None])
+        if latencies.size == 0:
+            return {'n_pulses': len(self.records), 'failed': len(self.records), 'unsent': self.unsent}
+        
+        return {
+            'n_pulses': len(self.records),
+            'failed': len(self.records) - latencies.size,
+            'unsent': self.unsent,
+            'mean_latency': float(latencies.mean()),
+            'max_latency': float(latencies.max())
+        }
+
+def raise_thread_priority():
+    """Best effort: raise the priority of the calling thread
+    
+    Above normal but not time-critical: the thread sleeps between pulses
+    and must not starve the render thread when it wakes.
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            THREAD_PRIORITY_ABOVE_NORMAL = 1
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_ABOVE_NORMAL)
+        elif hasattr(os, 'setpriority'):
+            # Linux threads have their own nice value (needs privileges to lower it)
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), -5)
+        return True
+    except Exception as e:
+        print(f"Could not raise thread priority: {e}")
+        return False
 
 class ScreeningTools:
     """Screening and calibration tools for the RSVP experiment"""
@@ -325,6 +988,7 @@ class ScreeningTools:
         self.window = window
         self.gamepad = None
         self.pulse_gen = None
+        self.report = {}  # Report of the last fast screening
     
     def set_hardware(self, gamepad, pulse_gen):
         """Set hardware components"""
@@ -381,6 +1045,127 @@ class ScreeningTools:
         
         print("Timing test completed")
     
+    def test_display_timing(self, n_flips=120, expected_ifi=None, max_dropped_rate=0.02):
+        """Flip interval check without prints or pauses, returns a report
+        
+        Intervals longer than 1.5 frames count as dropped frames. When the
+        expected frame interval is given, the measured refresh must be within
+        10% of it.
+        """
+        from psychopy import visual
+        
+        stim = visual.Rect(self.window, width=100, height=100, fillColor='white')
+        flip_times = []
+        for i in range(n_flips):
+            stim.draw()
+            flip_times.append(self.window.flip())
+        
+        intervals = np.diff(flip_times)
+        median_interval = float(np.median(intervals))
+        frame = expected_ifi or median_interval
+        dropped_frames = int(np.sum(intervals > 1.5 * frame))
+        dropped_rate = dropped_frames / intervals.size
+        refresh_ok = expected_ifi is None or abs(median_interval - expected_ifi) < 0.1 * expected_ifi
+        
+        return {
+            'passed': dropped_rate <= max_dropped_rate and refresh_ok,
+            'n_flips': n_flips,
+            'mean_interval': float(intervals.mean()),
+            'std_interval': float(intervals.std()),
+            'refresh_rate': 1.0 / median_interval,
+            'expected_refresh_rate': 1.0 / expected_ifi if expected_ifi else None,
+            'dropped_frames': dropped_frames,
+            'dropped_rate': dropped_rate
+        }
+    
+    def run_fast_screening(self, expected_ifi=None, cache_path=SCREENING_CACHE_FILE, skip_passed=True):
+        """Fast screening battery, returns a structured pass/fail report
+        
+        The pulse loopback runs on a background thread while the gamepad
+        probe and the display timing check run on this thread (the one that
+        owns pygame and the GL context). No check waits for the experimenter.
+        With skip_passed, checks that passed earlier today on this machine
+        with the same device (see cache_path) are not run again; a check
+        that fails is forgotten until it passes again.
+        """
+        start_time = time.perf_counter()
+        now = datetime.now()
+        today = now.date().isoformat()
+        host = socket.gethostname()
+        
+        cache = load_screening_cache(cache_path)
+        passed_today = cache.get('passed', {}) if (cache.get('date'), cache.get('host')) == (today, host) else {}
+        
+        # Check and the device it checks: a pass only counts for the same device
+        checks = {}
+        devices = {}
+        if self.pulse_gen is not None:
+            checks['pulse_loopback'] = self.pulse_gen.loopback_test
+            devices['pulse_loopback'] = self.pulse_gen.backend.device()
+        if self.gamepad is not None:
+            checks['gamepad'] = self.gamepad.probe
+            devices['gamepad'] = self.gamepad.gamepad_name
+        checks['display_timing'] = lambda: self.test_display_timing(expected_ifi=expected_ifi)
+        devices['display_timing'] = (f"{'x'.join(str(int(value)) for value in self.window.size)}"
+                                     f" @ {1.0 / expected_ifi:.1f} Hz" if expected_ifi else None)
+        
+        results = {}
+        for name in checks:
+            entry = passed_today.get(name)
+            if skip_passed and isinstance(entry, dict) and entry.get('device') == devices[name]:
+                results[name] = {'passed': True, 'skipped': True, 'passed_at': entry['passed_at']}
+        
+        def run_check(name):
+            check_start = time.perf_counter()
+            try:
+                result = checks[name]()
+            except Exception as e:
+                result = {'passed': False, 'error': f"{type(e).__name__}: {e}"}
+            result['skipped'] = False
+            result['duration'] = time.perf_counter() - check_start
+            results[name] = result
+        
+        main_thread_checks = ('gamepad', 'display_timing')
+        threads = [threading.Thread(target=run_check, args=(name,), name=f'Screening-{name}', daemon=True)
+                   for name in checks if name not in main_thread_checks and name not in results]
+        for thread in threads:
+            thread.start()
+        for name in main_thread_checks:
+            if name in checks and name not in results:
+                run_check(name)
+        for thread in threads:
+            thread.join()
+        
+        self.report = {
+            'passed': all(result['passed'] for result in results.values()),
+            'date': today,
+            'host': host,
+            'duration': time.perf_counter() - start_time,
+            'checks': {name: results[name] for name in checks}
+        }
+        
+        # Remember what passed today, forget what failed
+        for name, result in results.items():
+            if result['skipped']:
+                continue
+            if result['passed']:
+                passed_today[name] = {'device': devices[name], 'passed_at': now.isoformat(timespec='seconds')}
+            else:
+                passed_today.pop(name, None)
+        save_screening_cache(cache_path, {'date': today, 'host': host, 'passed': passed_today})
+        
+        print(f"Fast screening {'PASSED' if self.report['passed'] else 'FAILED'} "
+              f"in {self.report['duration']:.2f} s")
+        for name, result in self.report['checks'].items():
+            if result['skipped']:
+                print(f"  {name:<16} SKIP (passed at {result['passed_at']})")
+            else:
+                status = 'PASS' if result['passed'] else 'FAIL'
+                print(f"  {name:<16} {status} {result['duration']:6.2f} s"
+                      + (f"  {result['error']}" if 'error' in result else ''))
+        
+        return self.report
+    
     def run_screening_battery(self):
         """Run complete screening battery"""
         print("Starting RSVP Screening Battery")
@@ -406,35 +1191,118 @@ class ScreeningTools:
         
         print("Screening battery completed")
 
-def create_hardware_manager(config):
-    """Factory function to create hardware manager based on configuration"""
+def load_screening_cache(path):
+    """Fast screening cache (date, host and the checks passed that day with their device), {} if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_screening_cache(path, cache):
+    """Write the fast screening cache"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+class HardwareSession:
+    """Devices probed once per process and handed, live, to the experiment
     
-    hardware = {
-        'gamepad': None,
-        'pulse_gen': None,
-        'screening': None
-    }
-    
-    # Initialize gamepad if requested
-    if config.get('device_response') == 'gamepad':
-        gamepad = GamepadController()
-        if gamepad.initialize():
-            hardware['gamepad'] = gamepad
-        else:
-            print("Gamepad initialization failed, falling back to keyboard")
+    Each device is initialized at most once: the launcher's requirement
+    check probes the devices and the experiment takes the same, already
+    initialized objects from devices(). The discovered inventory and the
+    initialization time of each device are kept.
+    """
     
-    # Initialize pulse generator if requested
-    if config.get('withpulses', False):
-        pulse_gen = PulseGenerator(
-            device_name=config.get('daq_device', None),
-            port=config.get('daq_port', 'FIRSTPORTA')
-        )
-        if pulse_gen.initialize():
-            hardware['pulse_gen'] = pulse_gen
-        else:
-            print("Pulse generator initialization failed")
+    def __init__(self, config):
+        self.config = config
+        self.hardware = {
+            'keyboard': None,
+            'gamepad': None,
+            'pulse_gen': None,
+            'screening': None,
+            'init_times': {}  # Seconds spent initializing each device
+        }
+        self.inventory = {}
+        self.closed = False
+    
+    def probe_keyboard(self):
+        """Keyboard (timestamped backend if possible), initialized on first call"""
+        if 'keyboard' not in self.hardware['init_times']:
+            start_time = time.perf_counter()
+            keyboard = KeyboardInput(backend=self.config.get('keyboard_backend', 'psychopy'))
+            if keyboard.initialize():
+                self.hardware['keyboard'] = keyboard
+            self.inventory['keyboard'] = keyboard.backend
+            self.hardware['init_times']['keyboard'] = time.perf_counter() - start_time
+        return self.hardware['keyboard']
+    
+    def probe_gamepad(self):
+        """First gamepad, initialized on first call (None if there is none)"""
+        if 'gamepad' not in self.hardware['init_times']:
+            start_time = time.perf_counter()
+            gamepad = GamepadController()
+            if gamepad.initialize():
+                self.hardware['gamepad'] = gamepad
+                self.inventory['gamepad'] = {'name': gamepad.gamepad_name, 'buttons': gamepad.num_buttons}
+            else:
+                self.inventory['gamepad'] = None
+            self.hardware['init_times']['gamepad'] = time.perf_counter() - start_time
+        return self.hardware['gamepad']
+    
+    def probe_pulse_gen(self):
+        """Pulse generator on the configured trigger backend, initialized on first call"""
+        if 'pulse_gen' not in self.hardware['init_times']:
+            start_time = time.perf_counter()
+            pulse_gen = PulseGenerator(
+                device_name=self.config.get('daq_device', None),
+                port=self.config.get('daq_port', 'FIRSTPORTA'),
+                backend=create_trigger_backend(self.config)
+            )
+            if pulse_gen.initialize():
+                self.hardware['pulse_gen'] = pulse_gen
+            self.inventory['trigger'] = {'backend': pulse_gen.backend.name, 'available': pulse_gen.available}
+            if DAQ_INVENTORY:
+                self.inventory['daq_devices'] = [device.product_name for device in DAQ_INVENTORY]
+            self.hardware['init_times']['pulse_gen'] = time.perf_counter() - start_time
+        return self.hardware['pulse_gen']
+    
+    def probe(self):
+        """Initialize every device the configuration asks for (once), returns the hardware dict"""
+        self.probe_keyboard()
+        
+        # Initialize gamepad if requested
+        if self.config.get('device_response') == 'gamepad':
+            if not self.probe_gamepad():
+                print("Gamepad initialization failed, falling back to keyboard")
+        
+        # Initialize pulse generator if requested
+        if self.config.get('withpulses', False):
+            if not self.probe_pulse_gen():
+                print("Pulse generator initialization failed")
+        
+        return self.hardware
+    
+    def devices(self):
+        """Live devices for the experiment (only those its configuration asks for)"""
+        hardware = dict(self.probe())
+        if self.config.get('device_response') != 'gamepad':
+            hardware['gamepad'] = None
+        if not self.config.get('withpulses', False):
+            hardware['pulse_gen'] = None
+        return hardware
     
-    return hardware
+    def close(self):
+        """Clean up every probed device (once)"""
+        if not self.closed:
+            cleanup_hardware(self.hardware)
+            self.closed = True
+
+def create_hardware_manager(config):
+    """Factory function to create hardware manager based on configuration"""
+    return HardwareSession(config).probe()
 
 def cleanup_hardware(hardware):
     """Clean up all hardware components"""
@@ -463,7 +1331,42 @@ def test_pulses_standalone():
     else:
         print("Failed to initialize pulse generator")
 
+def record_triggers_standalone(host='127.0.0.1', port=5005, protocol='udp'):
+    """Minimal recorder: print the records of a socket trigger stream (Ctrl+C to stop)"""
+    print(f"Recording triggers on {protocol.upper()} {host}:{port}")
+    server = None
+    if protocol == 'tcp':
+        server = socket.create_server((host, port))
+        sock, _ = server.accept()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+    
+    pending = b''
+    try:
+        while True:
+            data = sock.recv(4096)
+            if not data and protocol == 'tcp':
+                print("Sender disconnected")
+                break
+            pending += data
+            for sequence, send_time, code in decode_trigger_records(pending):
+                print(f"#{sequence:5d}  t={send_time:10.4f}  code={code}")
+            pending = pending[len(pending) - len(pending) % TRIGGER_RECORD.size:]
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        if server:
+            server.close()
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'record':
+        # python rsvp_hardware.py record [udp|tcp] [port]
+        record_triggers_standalone(protocol=sys.argv[2] if len(sys.argv) > 2 else 'udp',
+                                   port=int(sys.argv[3]) if len(sys.argv) > 3 else 5005)
+        sys.exit(0)
+    
     print("RSVP Hardware Test Suite")
     print("=" * 30)
     
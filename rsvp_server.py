@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+RSVP Stimulus Server
+====================
+
+Long-running display daemon around RSVPExperiment. The window, hardware
+(gamepad, DAQ, pulse worker) and textures are set up once and stay warm;
+sessions are submitted by a control client over a localhost socket, so
+switching from one participant to the next takes seconds.
+
+Protocol: one JSON object per line in each direction (request, then reply).
+Requests carry a 'command':
+- configure      {"config": {...}}            update the session configuration
+- submit_trials  {"trial_structure": [...]}   use these sequences for the next run
+- start          {"participant_info": {...}}  start a run (replies immediately)
+- pause / resume                              hold the run before the next sequence
+- abort                                       end the run at the next input poll
+- status                                      server state and run progress
+- results                                     summary and responses of the last run
+- shutdown                                    close the window and release hardware
+
+Usage:
+    python rsvp_server.py serve [config_file] [port]
+    python rsvp_server.py <command> ['{"json": "arguments"}'] [port]
+"""
+
+import sys
+import json
+import queue
+import socket
+import threading
+import time
+from rsvp_experiment import RSVPExperiment
+from rsvp_data import json_default
+from rsvp_hardware import cleanup_hardware
+from rsvp_timing import session_clock
+
+DEFAULT_SERVER_PORT = 5010
+
+# Settings of the window itself; changing them needs a server restart
+WINDOW_KEYS = ('fullscreen', 'window_resolution')
+
+class StimulusServer:
+    """Keeps one RSVPExperiment warm and runs the sessions submitted by control clients
+    
+    The window belongs to the thread that created it, so configure, submit_trials,
+    start and shutdown are queued to the display thread (serve_forever); status,
+    pause, resume, abort and results are answered directly by the connection thread
+    of each client (several clients can be connected at once).
+    """
+    
+    def __init__(self, config_file=None, host='127.0.0.1', port=DEFAULT_SERVER_PORT):
+        self.config_file = config_file
+        self.address = (host, port)
+        self.experiment = None
+        self.commands = queue.Queue()
+        self.state = 'starting'  # starting, idle, running, paused, stopped
+        self.session_number = 0
+        self.run_started = None
+        self.trials_submitted = False
+        self.results = {}
+        self.loaded_pictures = None
+        self.listener = None
+        self.lock = threading.Lock()  # Run state changes requested by concurrent clients
+    
+    def start(self):
+        """Open the window, initialize hardware and load textures once"""
+        start_time = time.perf_counter()
+        session_clock.anchor()
+        
+        self.experiment = RSVPExperiment(self.config_file)
+        self.experiment.setup_window()
+        self.load_stimuli()
+        
+        self.listener = threading.Thread(target=self._listen, name='StimulusServer', daemon=True)
+        self.listener.start()
+        
+        self.state = 'idle'
+        print(f"Stimulus server ready in {time.perf_counter() - start_time:.1f} s, "
+              f"listening on {self.address[0]}:{self.address[1]}")
+    
+    def load_stimuli(self):
+        """Decode the images of config['pictures_path'] and create their textures"""
+        decoded_images = self.experiment.read_images()
+        self.experiment.create_textures(decoded_images)
+        self.loaded_pictures = self.experiment.config['pictures_path']
+    
+    def serve_forever(self):
+        """Display thread: keep the window alive and execute queued commands"""
+        try:
+            while self.state != 'stopped':
+                try:
+                    request, reply = self.commands.get(timeout=0.05)
+                except queue.Empty:
+                    self.experiment.window.flip()
+                    continue
+                
+                if request['command'] == 'start':
+                    reply.put({'ok': True, 'session': self.session_number + 1})
+                    self.run_session(request.get('participant_info', {}))
+                else:
+                    reply.put(self.execute(request))
+        finally:
+            self.cleanup()
+    
+    def execute(self, request):
+        """Run a display-thread command, returns the reply"""
+        command = request['command']
+        try:
+            if command == 'configure':
+                return self.configure(request.get('config', {}))
+            if command == 'submit_trials':
+                return self.submit_trials(request.get('trial_structure', []))
+            if command == 'shutdown':
+                self.state = 'stopped'
+                return {'ok': True}
+        except Exception as e:
+            return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        return {'ok': False, 'error': f"Unknown command: {command}"}
+    
+    def configure(self, config):
+        """Update the configuration of the next sessions
+        
+        The merged configuration is validated first and applied only if it
+        passes; if its pictures cannot be loaded, the previous configuration
+        is restored.
+        """
+        experiment = self.experiment
+        ignored = [key for key in WINDOW_KEYS if key in config and config[key] != experiment.config.get(key)]
+        merged = dict(experiment.config)
+        merged.update({key: value for key, value in config.items() if key not in ignored})
+        if merged.get('fast_rsvp', False):
+            experiment.check_fast_rsvp(1.0 / merged.get('refresh_rate', 60), merged)
+        
+        previous = dict(experiment.config)
+        experiment.config.update(merged)
+        try:
+            # Only a new pictures directory or bundle needs loading again
+            if experiment.config['pictures_path'] != self.loaded_pictures:
+                self.load_stimuli()
+        except Exception:
+            experiment.config.clear()
+            experiment.config.update(previous)
+            raise
+        
+        experiment.wait_reset = experiment.config.get('pulse_width', 0.04)
+        if experiment.config.get('fast_rsvp', False):
+            experiment.check_measured_refresh(experiment.ifi)
+        self.trials_submitted = False
+        return {'ok': True, 'restart_required': ignored, 'n_images': len(experiment.image_names)}
+    
+    def submit_trials(self, trial_structure):
+        """Use the given sequences (as generated by generate_trial_structure) for the next run"""
+        n_images = len(self.experiment.image_names)
+        for sequence_info in trial_structure:
+            missing = [key for key in ('sequence_number', 'image_indices', 'isi', 'blank_duration')
+                       if key not in sequence_info]
+            if missing:
+                raise ValueError(f"Sequence is missing {', '.join(missing)}")
+            if any(not 0 <= index < n_images for index in sequence_info['image_indices']):
+                raise ValueError(f"Sequence {sequence_info['sequence_number']} has image indices "
+                                 f"outside 0-{n_images - 1}")
+        
+        self.experiment.trial_structure = trial_structure
+        self.experiment.image_textures.set_schedule(trial_structure)
+        self.trials_submitted = True
+        return {'ok': True, 'n_sequences': len(trial_structure)}
+    
+    def run_session(self, participant_info):
+        """Run one session on the warm window and hardware, then save its data"""
+        experiment = self.experiment
+        self.session_number += 1
+        self.state = 'running'
+        self.run_started = session_clock.now()
+        print(f"Session {self.session_number}: {participant_info.get('Participant ID', 'unknown')}")
+        
+        try:
+            experiment.reset_session()
+            experiment.start_event_log(participant_info)
+            if 'Language' in participant_info:
+                experiment.config['language'] = participant_info['Language'].lower()
+            
+            # Sequences submitted by the client, or generated from the configuration
+            if not self.trials_submitted:
+                experiment.generate_trial_structure()
+            experiment.compile_timelines()
+            
+            completed = experiment.run_sequences()
+            aborted = experiment.abort_requested.is_set()
+            experiment.save_data(participant_info)
+            
+            self.results = {
+                'session': self.session_number,
+                'completed': completed,
+                'aborted': aborted,
+                'duration': session_clock.now() - self.run_started,
+                'data_file': experiment.data_file,
+                'summary': experiment.calculate_summary(),
+                'responses': experiment.responses,
+                'frame_timing': experiment.frame_log.summaries
+            }
+        except Exception as e:
+            print(f"Error during session {self.session_number}: {e}")
+            self.results = {'session': self.session_number, 'completed': False, 'error': str(e)}
+        finally:
+            if experiment.event_log:
+                experiment.event_log.close()
+            self.trials_submitted = False
+            self.state = 'idle'
+    
+    def handle(self, request):
+        """Answer a request (connection thread)"""
+        command = request.get('command')
+        experiment = self.experiment
+        
+        if command == 'status':
+            status = {'ok': True, 'state': self.state, 'session': self.session_number}
+            if self.state in ('running', 'paused'):
+                status['elapsed'] = session_clock.now() - self.run_started
+                status['sequences_done'] = len(experiment.sequence_timing)
+                status['n_sequences'] = len(experiment.trial_structure)
+                status['responses'] = len(experiment.responses)
+                status['summary'] = experiment.calculate_summary()
+            return status
+        
+        if command == 'results':
+            return {'ok': True, **self.results}
+        
+        with self.lock:
+            if command in ('pause', 'resume', 'abort'):
+                if self.state not in ('running', 'paused'):
+                    return {'ok': False, 'error': 'No run in progress'}
+                if command == 'pause':
+                    experiment.resume.clear()
+                    self.state = 'paused'
+                elif command == 'resume':
+                    experiment.resume.set()
+                    self.state = 'running'
+                else:
+                    experiment.abort_requested.set()
+                    experiment.resume.set()
+                return {'ok': True, 'state': self.state}
+            
+            if self.state in ('running', 'paused') and command != 'shutdown':
+                return {'ok': False, 'error': f"Cannot {command} during a run"}
+            
+            # Display-thread command: wait for the display thread to execute it
+            if command == 'start':
+                self.state = 'running'
+        reply = queue.Queue(maxsize=1)
+        self.commands.put((request, reply))
+        return reply.get()
+    
+    def _listen(self):
+        """Accept control clients, each served on its own connection thread"""
+        server = socket.create_server(self.address)
+        while self.state != 'stopped':
+            connection, _ = server.accept()
+            threading.Thread(target=self._serve_client, args=(connection,),
+                             name='StimulusServerClient', daemon=True).start()
+        server.close()
+    
+    def _serve_client(self, connection):
+        """Answer the requests of one control client until it disconnects"""
+        try:
+            with connection, connection.makefile('rw', encoding='utf-8') as stream:
+                for line in stream:
+                    try:
+                        request = json.loads(line)
+                        if request.get('command') == 'shutdown' and self.state in ('running', 'paused'):
+                            self.experiment.abort_requested.set()
+                            self.experiment.resume.set()
+                        reply = self.handle(request)
+                    except ValueError as e:
+                        reply = {'ok': False, 'error': f"Invalid request: {e}"}
+                    stream.write(json.dumps(reply, default=json_default) + '\n')
+                    stream.flush()
+        except OSError:
+            pass  # Client went away
+    
+    def cleanup(self):
+        """Release hardware and close the window"""
+        experiment = self.experiment
+        if experiment.pulse_worker:
+            experiment.pulse_worker.stop()
+        if experiment.telemetry:
+            experiment.telemetry.stop()
+        if experiment.hardware:
+            cleanup_hardware(experiment.hardware)
+        if experiment.window:
+            experiment.window.close()
+        print("Stimulus server stopped")
+
+class ServerClient:
+    """Control client of a StimulusServer"""
+    
+    def __init__(self, host='127.0.0.1', port=DEFAULT_SERVER_PORT, timeout=30.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.stream = self.sock.makefile('rw', encoding='utf-8')
+    
+    def request(self, command, **fields):
+        """Send a command and return the server's reply"""
+        fields['command'] = command
+        self.stream.write(json.dumps(fields) + '\n')
+        self.stream.flush()
+        return json.loads(self.stream.readline())
+    
+    def configure(self, config):
+        return self.request('configure', config=config)
+    
+    def submit_trials(self, trial_structure):
+        return self.request('submit_trials', trial_structure=trial_structure)
+    
+    def start(self, participant_info):
+        return self.request('start', participant_info=participant_info)
+    
+    def wait_until_idle(self, poll_interval=1.0):
+        """Wait for the current run to end, returns its results"""
+        while self.request('status')['state'] != 'idle':
+            time.sleep(poll_interval)
+        return self.request('results')
+    
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+def run_server(config_file=None, port=DEFAULT_SERVER_PORT):
+    """Start the stimulus server and serve until shutdown"""
+    server = StimulusServer(config_file, port=port)
+    server.start()
+    server.serve_forever()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python rsvp_server.py serve [config_file] [port]")
+        print("       python rsvp_server.py <command> ['{\"json\": \"arguments\"}'] [port]")
+        sys.exit(1)
+    
+    if sys.argv[1] == 'serve':
+        run_server(sys.argv[2] if len(sys.argv) > 2 else None,
+                   int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_SERVER_PORT)
+    else:
+        arguments = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+        client = ServerClient(port=int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_SERVER_PORT)
+        print(json.dumps(client.request(sys.argv[1], **arguments), indent=2))
+        client.close()
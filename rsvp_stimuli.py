@@ -0,0 +1,701 @@
+"""
+RSVP Stimulus Loading Module
+============================
+
+This module provides the CPU side of stimulus loading for the RSVP experiment:
+- Image discovery in the pictures directory (one directory scan)
+- Parallel decoding and resizing of images to the display size
+- Per-image and total load time reporting
+- Persistent on-disk cache of decoded arrays (memory-mapped on warm starts)
+- Lazy per-sequence texture residency within a GPU memory budget
+- Single-file stimulus bundles (pre-resized pixels, memory-mapped on load)
+- Colored lines precomposed with the images (one texture per image and line colors)
+
+Images are decoded into RGBA NumPy arrays on a thread pool (Pillow releases
+the GIL while decoding). Textures are only created by the TextureManager,
+in batches on the window (GL) thread, for the sequences about to be shown.
+
+Dependencies:
+- numpy
+- Pillow (installed together with psychopy)
+"""
+
+import os
+import time
+import json
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+# File extensions accepted as stimulus images (compared lower-case)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Stimulus bundle layout: magic, format version, JSON index length, JSON index,
+# then the pixel data of every image, each block aligned to BUNDLE_ALIGNMENT
+BUNDLE_MAGIC = b'RSVPBNDL'
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct('<8sII')
+BUNDLE_ALIGNMENT = 64
+
+def find_image_files(pictures_path):
+    """Find all image files in a pictures directory, sorted by name"""
+    image_files = []
+    
+    with os.scandir(pictures_path) as entries:
+        for entry in entries:
+            # Skip macOS resource-fork files (._name.jpg), they are not images
+            if entry.name.startswith('._') or not entry.is_file():
+                continue
+            if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                image_files.append(entry.path)
+    
+    return sorted(image_files)
+
+def fit_size(image_size, max_size):
+    """Scale an image size down to fit inside max_size (never scales up)"""
+    width, height = image_size
+    max_width, max_height = max_size
+    
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+def hash_file(path, chunk_size=1 << 20):
+    """Content hash of a file (hex digest)"""
+    digest = hashlib.blake2b(digest_size=16)
+    
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    
+    return digest.hexdigest()
+
+def decode_image(image_file, max_size, cache=None):
+    """Decode one image file into an RGBA uint8 array no larger than max_size"""
+    start_time = time.perf_counter()
+    
+    # Warm start: memory-map the cached array and skip decoding
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(image_file, max_size)
+        pixels = cache.get(cache_key)
+        if pixels is not None:
+            return {
+                'name': os.path.basename(image_file),
+                'path': image_file,
+                'pixels': pixels,
+                'decode_time': time.perf_counter() - start_time,
+                'source': 'cache'
+            }
+    
+    with Image.open(image_file) as img:
+        target_size = fit_size(img.size, max_size)
+        
+        # Let the JPEG decoder downscale in the DCT domain when shrinking
+        img.draft('RGB', target_size)
+        
+        rgba = img.convert('RGBA')
+        if rgba.size != target_size:
+            rgba = rgba.resize(target_size, Image.LANCZOS)
+    
+    pixels = np.asarray(rgba)
+    if cache is not None:
+        cache.put(cache_key, pixels, image_file)
+    
+    return {
+        'name': os.path.basename(image_file),
+        'path': image_file,
+        'pixels': pixels,
+        'decode_time': time.perf_counter() - start_time,
+        'source': 'decoded'
+    }
+
+class StimulusCache:
+    """Persistent cache of decoded, resized RGBA arrays stored as .npy files
+    
+    Entries are keyed by the content hash of the source file plus the target
+    resolution, so files with identical content share one entry. A file
+    whose size or modification time changed is re-hashed, and entries left
+    behind by its old content are dropped once no other file uses them.
+    The total cache size is capped, evicting least recently used entries
+    first, but never an entry used by the current load. A relative
+    cache_dir is taken from the directory of this module.
+    """
+    
+    INDEX_FILE = 'index.json'
+    
+    def __init__(self, cache_dir='stimulus_cache', max_bytes=512 * 1024 * 1024):
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), cache_dir)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.used = set()  # Keys read or written by the current load (never evicted)
+        
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        
+        # entries: key -> {'file', 'bytes', 'last_used', 'sources'}
+        # sources: path -> {'size', 'mtime_ns', 'hash'} (skips re-hashing unchanged files)
+        self.index = {'entries': {}, 'sources': {}}
+        index_path = os.path.join(cache_dir, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"Error reading stimulus cache index, starting empty: {e}")
+        
+        # Indexes written before entries were shared kept a single source
+        for entry in self.index['entries'].values():
+            if 'sources' not in entry:
+                entry['sources'] = [entry.pop('source')] if 'source' in entry else []
+    
+    def make_key(self, image_file, max_size):
+        """Cache key for an image file at a given target resolution"""
+        path = os.path.abspath(image_file)
+        stat = os.stat(path)
+        
+        with self.lock:
+            known = self.index['sources'].get(path)
+        
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            content_hash = known['hash']
+        else:
+            content_hash = hash_file(path)
+            with self.lock:
+                self.index['sources'][path] = {
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'hash': content_hash
+                }
+        
+        return f"{content_hash}_{int(max_size[0])}x{int(max_size[1])}"
+    
+    def get(self, key):
+        """Return the cached array for a key as a read-only memmap, or None"""
+        with self.lock:
+            entry = self.index['entries'].get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry['last_used'] = time.time()
+            self.used.add(key)
+        
+        try:
+            pixels = np.load(os.path.join(self.cache_dir, entry['file']), mmap_mode='r')
+        except Exception as e:
+            print(f"Error reading cached stimulus {key}, decoding again: {e}")
+            with self.lock:
+                self.index['entries'].pop(key, None)
+                self.misses += 1
+            return None
+        
+        with self.lock:
+            self.hits += 1
+        return pixels
+    
+    def put(self, key, pixels, image_file):
+        """Store a decoded array and release the stale entries of the same source file"""
+        filename = f"{key}.npy"
+        file_path = os.path.join(self.cache_dir, filename)
+        
+        # Write to a temporary name first so a crash never leaves a partial entry
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, pixels)
+        os.replace(temp_path, file_path)
+        
+        source = os.path.abspath(image_file)
+        resolution = key.rsplit('_', 1)[1]
+        
+        with self.lock:
+            # Old content of this file: drop the entry once no file uses it
+            stale = [old_key for old_key, entry in self.index['entries'].items()
+                     if source in entry['sources'] and old_key != key
+                     and old_key.rsplit('_', 1)[1] == resolution]
+            for old_key in stale:
+                self.index['entries'][old_key]['sources'].remove(source)
+                if not self.index['entries'][old_key]['sources'] and old_key not in self.used:
+                    self._remove_entry(old_key)
+            
+            entry = self.index['entries'].get(key)
+            sources = entry['sources'] if entry else []
+            if source not in sources:
+                sources.append(source)
+            self.index['entries'][key] = {
+                'file': filename,
+                'bytes': os.path.getsize(file_path),
+                'last_used': time.time(),
+                'sources': sources
+            }
+            self.used.add(key)
+    
+    def _remove_entry(self, key):
+        """Delete one entry and its file (caller holds the lock)
+        
+        Returns False, keeping the entry, if the file cannot be removed
+        (on Windows, while it is still memory-mapped).
+        """
+        entry = self.index['entries'].get(key)
+        if entry is None:
+            return True
+        try:
+            os.remove(os.path.join(self.cache_dir, entry['file']))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        del self.index['entries'][key]
+        return True
+    
+    def total_bytes(self):
+        """Total size of all cached arrays"""
+        return sum(entry['bytes'] for entry in self.index['entries'].values())
+    
+    def evict(self):
+        """Evict least recently used entries until the cache fits max_bytes
+        
+        Entries used by the current load are kept even above max_bytes, and
+        an entry whose file cannot be removed is skipped.
+        """
+        with self.lock:
+            total = self.total_bytes()
+            by_age = sorted(self.index['entries'].items(), key=lambda item: item[1]['last_used'])
+            
+            evicted = 0
+            for key, entry in by_age:
+                if total <= self.max_bytes:
+                    break
+                if key in self.used or not self._remove_entry(key):
+                    continue
+                total -= entry['bytes']
+                evicted += 1
+        
+        return evicted
+    
+    def save(self):
+        """Apply the size cap and write the cache index to disk"""
+        evicted = self.evict()
+        if evicted:
+            print(f"Stimulus cache: evicted {evicted} least recently used entries")
+        
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with self.lock:
+            with open(f"{index_path}.tmp", 'w') as f:
+                json.dump(self.index, f)
+        os.replace(f"{index_path}.tmp", index_path)
+
+class StimulusLoader:
+    """Decode and resize stimulus images on a worker pool"""
+    
+    def __init__(self, max_size, workers=None, cache=None):
+        self.max_size = tuple(max_size)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.cache = cache
+        self.total_time = 0.0
+    
+    def decode_images(self, image_files):
+        """Decode all images in parallel, returning records in input order"""
+        start_time = time.perf_counter()
+        records = []
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(decode_image, image_file, self.max_size, self.cache)
+                       for image_file in image_files]
+            
+            for image_file, future in zip(image_files, futures):
+                try:
+                    records.append(future.result())
+                except Exception as e:
+                    print(f"Error loading image {image_file}: {e}")
+        
+        if self.cache is not None:
+            self.cache.save()
+        
+        self.total_time = time.perf_counter() - start_time
+        return records
+    
+    def build_report(self, records, upload_time=0.0):
+        """Build the load time report (per-image decode times and totals)"""
+        return build_load_report(records, self.total_time, self.workers, self.max_size, upload_time)
+
+def build_load_report(records, wall_time, workers, max_size, upload_time=0.0):
+    """Load time report: per-image times plus totals"""
+    per_image = {record['name']: record['decode_time'] for record in records}
+    decode_times = np.array(list(per_image.values())) if per_image else np.zeros(1)
+    
+    return {
+        'n_images': len(records),
+        'workers': workers,
+        'max_size': list(max_size),
+        'cache_hits': sum(1 for record in records if record.get('source') == 'cache'),
+        'decode_wall_time': wall_time,
+        'decode_cpu_time': float(decode_times.sum()),
+        'mean_image_time': float(decode_times.mean()),
+        'max_image_time': float(decode_times.max()),
+        'upload_time': upload_time,
+        'total_time': wall_time + upload_time,
+        'per_image': per_image
+    }
+
+def is_stimulus_bundle(path):
+    """True if path is a stimulus bundle file (rather than a pictures directory)"""
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(BUNDLE_MAGIC)) == BUNDLE_MAGIC
+
+def _align(offset):
+    """Round an offset up to the bundle alignment"""
+    return (offset + BUNDLE_ALIGNMENT - 1) // BUNDLE_ALIGNMENT * BUNDLE_ALIGNMENT
+
+def pack_stimulus_bundle(pictures_path, bundle_path, max_size, workers=None):
+    """Pack a pictures directory into a single stimulus bundle file
+    
+    Every image is decoded and resized to fit max_size once, at packing
+    time. The bundle holds an index (name, size, source hash and offset of
+    each image) followed by the contiguous RGBA pixel data.
+    """
+    image_files = find_image_files(pictures_path)
+    if not image_files:
+        raise FileNotFoundError(f"No image files found in {pictures_path}")
+    
+    loader = StimulusLoader(max_size=max_size, workers=workers)
+    records = loader.decode_images(image_files)
+    
+    index = []
+    offset = 0
+    for record in records:
+        height, width = record['pixels'].shape[:2]
+        index.append({
+            'name': record['name'],
+            'width': width,
+            'height': height,
+            'offset': offset,
+            'nbytes': record['pixels'].nbytes,
+            'source_bytes': os.path.getsize(record['path']),
+            'source_hash': hash_file(record['path'])
+        })
+        offset = _align(offset + record['pixels'].nbytes)
+    
+    header = json.dumps({
+        'max_size': [int(max_size[0]), int(max_size[1])],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'images': index
+    }).encode('utf-8')
+    data_offset = _align(BUNDLE_HEADER.size + len(header))
+    
+    with open(bundle_path, 'wb') as f:
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header)))
+        f.write(header)
+        for entry, record in zip(index, records):
+            f.seek(data_offset + entry['offset'])
+            f.write(np.ascontiguousarray(record['pixels']).tobytes())
+    
+    print(f"Packed {len(records)} images into {bundle_path} "
+          f"({(data_offset + offset) / 1e6:.1f} MB, max size {max_size[0]}x{max_size[1]})")
+    return len(records)
+
+class StimulusBundle:
+    """Read-only, memory-mapped view of a stimulus bundle file"""
+    
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path
+        
+        with open(bundle_path, 'rb') as f:
+            magic, version, header_length = BUNDLE_HEADER.unpack(f.read(BUNDLE_HEADER.size))
+            if magic != BUNDLE_MAGIC:
+                raise ValueError(f"Not a stimulus bundle: {bundle_path}")
+            if version != BUNDLE_VERSION:
+                raise ValueError(f"Unsupported stimulus bundle version {version}: {bundle_path}")
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        
+        self.max_size = tuple(header['max_size'])
+        self.index = header['images']
+        self.data_offset = _align(BUNDLE_HEADER.size + header_length)
+        self.data = np.memmap(bundle_path, dtype=np.uint8, mode='r')
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def records(self):
+        """Image records with zero-copy pixel views into the mapped file"""
+        records = []
+        
+        for entry in self.index:
+            start = self.data_offset + entry['offset']
+            pixels = self.data[start:start + entry['nbytes']].reshape(entry['height'], entry['width'], 4)
+            records.append({
+                'name': entry['name'],
+                'path': self.bundle_path,
+                'pixels': pixels,
+                'decode_time': 0.0,
+                'source': 'bundle'
+            })
+        
+        return records
+
+def lines_canvas_shape(image_shape, layout):
+    """Height and width of an image with the lines above and below it"""
+    height, width = image_shape[:2]
+    reach = (layout['height'] + 1) // 2 + layout['offset'] + (layout['size_line'] + 1) // 2
+    return max(height, 2 * reach), max(width, layout['width'])
+
+def compose_lines(pixels, layout, state):
+    """Draw the two colored lines around an image into one RGBA array
+    
+    As in the MATLAB version, the lines span the reference image rect
+    (layout 'width' x 'height', centered) and sit `offset` pixels above and
+    below it, `size_line` pixels thick. state indexes layout['states'], a
+    list of (top color, bottom color). pixels=None gives the lines alone.
+    """
+    image_shape = pixels.shape if pixels is not None else (0, 0)
+    canvas_height, canvas_width = lines_canvas_shape(image_shape, layout)
+    canvas = np.zeros((canvas_height, canvas_width, 4), dtype=np.uint8)
+    center_y, center_x = canvas_height // 2, canvas_width // 2
+    
+    if pixels is not None:
+        height, width = image_shape[:2]
+        top, left = center_y - height // 2, center_x - width // 2
+        canvas[top:top + height, left:left + width] = pixels
+    
+    rect_top = center_y - layout['height'] // 2
+    rect_left = center_x - layout['width'] // 2
+    size_line = layout['size_line']
+    color_up, color_down = layout['states'][state]
+    
+    for color, line_y in ((color_up, rect_top - layout['offset']),
+                          (color_down, rect_top + layout['height'] + layout['offset'])):
+        line_top = line_y - size_line // 2
+        canvas[line_top:line_top + size_line, rect_left:rect_left + layout['width'], :3] = color
+        canvas[line_top:line_top + size_line, rect_left:rect_left + layout['width'], 3] = 255
+    
+    return canvas
+
+def sequence_texture_keys(sequence_info):
+    """Texture keys a sequence shows: image indices, or (index, line state) with the lines task
+    
+    Index -1 stands for the lines alone (blanks while the lines are on).
+    """
+    image_indices = list(sequence_info['image_indices'])
+    lines = sequence_info.get('lines')
+    if not lines:
+        return image_indices
+    
+    state = lines['start_state']
+    changes = {change['position']: change['state'] for change in lines['changes']}
+    keys = [(-1, state)]
+    
+    for position, index in enumerate(image_indices):
+        keys.append((index, state))
+        if position in changes:
+            state = changes[position]
+            keys.append((index, state))
+    
+    keys.append((-1, state))
+    return keys
+
+class TextureManager:
+    """Keep only the textures of the upcoming sequences resident on the GPU
+    
+    Decoded pixel arrays stay in CPU memory; ImageStim textures are created
+    for the next `lookahead` sequences of the trial structure and released
+    once no upcoming sequence needs them. Indexing works like the list of
+    ImageStims it replaces (a missing texture is uploaded on demand).
+    
+    With a lines layout (see compose_lines), keys can also be
+    (index, line state): the image and its lines are precomposed into one
+    texture so every frame is a single draw call.
+    """
+    
+    def __init__(self, window, decoded_images, budget_bytes=256 * 1024 * 1024, lookahead=2, lines=None):
+        self.window = window
+        self.images = decoded_images
+        self.budget_bytes = budget_bytes
+        self.lookahead = max(1, lookahead)
+        self.lines = lines
+        self.schedule = []
+        self.current = set()
+        
+        # index -> ImageStim, least recently used first
+        self.resident = OrderedDict()
+        self.resident_bytes = 0
+        
+        self.uploads = 0
+        self.evictions = 0
+        self.misses = 0
+        self.upload_time = 0.0
+    
+    def __len__(self):
+        return len(self.images)
+    
+    def __getitem__(self, index):
+        return self.get(index)
+    
+    def texture_bytes(self, key):
+        """GPU memory used by one texture (RGBA, 8 bits per channel)"""
+        if isinstance(key, tuple):
+            index = key[0]
+            image_shape = self.images[index]['pixels'].shape if index >= 0 else (0, 0)
+            height, width = lines_canvas_shape(image_shape, self.lines)
+        else:
+            height, width = self.images[key]['pixels'].shape[:2]
+        return height * width * 4
+    
+    def pixels(self, key):
+        """RGBA pixels of a texture key (composed with the lines for (index, state) keys)"""
+        if isinstance(key, tuple):
+            index, state = key
+            return compose_lines(self.images[index]['pixels'] if index >= 0 else None, self.lines, state)
+        return self.images[key]['pixels']
+    
+    def set_schedule(self, trial_structure, timelines=None):
+        """Set the upcoming texture keys from the trial structure
+        
+        With the compiled timelines (by sequence number) the keys are those
+        the timelines show (a line color change may move to a later image).
+        """
+        from rsvp_timing import event_texture_key
+        
+        timelines = timelines or {}
+        self.schedule = []
+        for sequence in trial_structure:
+            timeline = timelines.get(sequence['sequence_number'])
+            if timeline is None:
+                self.schedule.append(sequence_texture_keys(sequence))
+                continue
+            keys = [event_texture_key(int(stim_id), int(lines))
+                    for stim_id, lines in zip(timeline['stim_id'], timeline['lines'])]
+            self.schedule.append([key for key in keys if key is not None])
+    
+    def prepare(self, sequence_position):
+        """Make the textures of the next sequences resident, evicting the rest
+        
+        Sequences after the current one are only preloaded while they fit in
+        the memory budget. Returns the time spent uploading.
+        """
+        start_time = time.perf_counter()
+        upcoming = self.schedule[sequence_position:sequence_position + self.lookahead]
+        if not upcoming:
+            return 0.0
+        
+        self.current = set(upcoming[0])
+        needed = set().union(*upcoming)
+        
+        # Release textures no upcoming sequence uses
+        for index in [index for index in self.resident if index not in needed]:
+            self._release(index)
+        
+        current_bytes = sum(self.texture_bytes(index) for index in self.current)
+        if current_bytes > self.budget_bytes:
+            print(f"Warning: sequence needs {current_bytes / 1e6:.1f} MB of textures, "
+                  f"above the {self.budget_bytes / 1e6:.1f} MB budget")
+        
+        # Current sequence first, then lookahead sequences within the budget
+        for sequence_indices in upcoming:
+            for index in sequence_indices:
+                if index in self.resident:
+                    self.resident.move_to_end(index)
+                    continue
+                if index not in self.current and self.resident_bytes + self.texture_bytes(index) > self.budget_bytes:
+                    continue
+                self._upload(index)
+        
+        elapsed = time.perf_counter() - start_time
+        self.upload_time += elapsed
+        return elapsed
+    
+    def get(self, index):
+        """Texture for an image index, uploading it on demand if not resident"""
+        stim = self.resident.get(index)
+        if stim is None:
+            self.misses += 1
+            start_time = time.perf_counter()
+            stim = self._upload(index)
+            self._enforce_budget()
+            self.upload_time += time.perf_counter() - start_time
+        return stim
+    
+    def _upload(self, index):
+        """Create the texture for one image (window thread only)"""
+        from psychopy import visual
+        
+        pixels = self.pixels(index)
+        height, width = pixels.shape[:2]
+        
+        stim = visual.ImageStim(
+            win=self.window,
+            image=Image.fromarray(np.ascontiguousarray(pixels), 'RGBA'),
+            size=(width, height),
+            units='pix'
+        )
+        
+        self.resident[index] = stim
+        self.resident_bytes += self.texture_bytes(index)
+        self.uploads += 1
+        
+        return stim
+    
+    def _enforce_budget(self):
+        """Drop least recently used textures outside the current sequence until within budget"""
+        for index in list(self.resident):
+            if self.resident_bytes <= self.budget_bytes:
+                break
+            if index not in self.current:
+                self._release(index)
+    
+    def _release(self, index):
+        """Drop one texture and free its GPU memory"""
+        stim = self.resident.pop(index)
+        self.resident_bytes -= self.texture_bytes(index)
+        self.evictions += 1
+        
+        if hasattr(stim, 'clearTextures'):
+            stim.clearTextures()
+    
+    def release_all(self):
+        """Release every resident texture"""
+        for index in list(self.resident):
+            self._release(index)
+    
+    def stats(self):
+        """Texture residency statistics"""
+        return {
+            'resident': len(self.resident),
+            'resident_bytes': self.resident_bytes,
+            'budget_bytes': self.budget_bytes,
+            'uploads': self.uploads,
+            'evictions': self.evictions,
+            'misses': self.misses,
+            'upload_time': self.upload_time
+        }
+
+def print_load_report(report, n_slowest=3):
+    """Print a short summary of a load time report"""
+    print(f"Decoded {report['n_images']} images in {report['decode_wall_time']:.2f} s "
+          f"({report['workers']} workers, mean {report['mean_image_time']*1000:.1f} ms/image, "
+          f"{report['cache_hits']} from cache)")
+    print(f"Texture upload: {report['upload_time']:.2f} s, total load time: {report['total_time']:.2f} s")
+    
+    slowest = sorted(report['per_image'].items(), key=lambda item: item[1], reverse=True)
+    for name, load_time in slowest[:n_slowest]:
+        print(f"  slowest: {name} ({load_time*1000:.1f} ms)")
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Pack a pictures directory into a stimulus bundle")
+    parser.add_argument('pictures_path', help="Directory with the stimulus images")
+    parser.add_argument('bundle_path', help="Output bundle file (e.g. stimuli_1920x1080.rsvpb)")
+    parser.add_argument('--resolution', nargs=2, type=int, default=[1920, 1080],
+                        metavar=('WIDTH', 'HEIGHT'), help="Window resolution images are fitted to")
+    parser.add_argument('--workers', type=int, default=None, help="Decode threads")
+    args = parser.parse_args()
+    
+    pack_stimulus_bundle(args.pictures_path, args.bundle_path, args.resolution, args.workers)
@@ -0,0 +1,178 @@
+"""
+RSVP Telemetry Module
+=====================
+
+This module streams the progress of a running experiment to the experimenter:
+- TelemetryPublisher: JSON messages over a localhost UDP socket, sent by a
+  background thread from a bounded queue (messages are dropped, never waited
+  for, when the queue is full)
+- TelemetryConsole: console client showing live accuracy and reaction time statistics
+
+Messages carry a 'type' and the session clock time 't':
+sequence_start, onset, response, sequence_end, dropped_frames and pulse_error.
+
+Usage (in a second terminal while the experiment runs):
+    python rsvp_telemetry.py [port]
+
+Dependencies:
+- numpy
+"""
+
+import sys
+import json
+import queue
+import socket
+import threading
+import numpy as np
+
+DEFAULT_TELEMETRY_PORT = 5006
+
+class TelemetryPublisher:
+    """Non-blocking publisher of experiment events
+    
+    publish() only puts the message in a bounded queue; encoding and sending
+    happen on a background thread. When the queue is full the message is
+    dropped and counted, so the render loop never waits for the console.
+    """
+    
+    def __init__(self, host='127.0.0.1', port=DEFAULT_TELEMETRY_PORT, queue_size=1000, clock=None):
+        self.address = (host, port)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.clock = clock
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.sock = None
+        self.thread = None
+    
+    def start(self):
+        """Open the socket and start the sender thread"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.thread = threading.Thread(target=self._run, name='TelemetryPublisher', daemon=True)
+        self.thread.start()
+        print(f"Telemetry: UDP {self.address[0]}:{self.address[1]}")
+    
+    def publish(self, kind, **fields):
+        """Queue a message, or drop it if the queue is full"""
+        if self.thread is None:
+            return
+        fields['type'] = kind
+        if self.clock is not None:
+            fields.setdefault('t', self.clock.now())
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+    
+    def stop(self, timeout=1.0):
+        """Send the messages still queued, then stop the sender thread"""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+        self.sock.close()
+    
+    def _run(self):
+        """Sender loop: one JSON message per datagram"""
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+            try:
+                self.sock.sendto(json.dumps(message).encode('utf-8'), self.address)
+                self.sent += 1
+            except (OSError, TypeError, ValueError):
+                # No console listening, or a message that cannot be encoded
+                self.errors += 1
+    
+    def stats(self):
+        """Messages sent, dropped (queue full) and failed"""
+        return {'sent': self.sent, 'dropped': self.dropped, 'errors': self.errors}
+
+class TelemetryConsole:
+    """Console client: receives telemetry and prints live accuracy and RT statistics"""
+    
+    def __init__(self, host='127.0.0.1', port=DEFAULT_TELEMETRY_PORT):
+        self.address = (host, port)
+        self.sequence = None
+        self.n_onsets = 0
+        self.reaction_times = []
+        self.n_correct = 0
+        self.dropped_frames = 0
+        self.pulse_errors = 0
+    
+    def handle(self, message):
+        """Update the statistics with one message, returns a status line or None"""
+        kind = message.get('type')
+        
+        if kind == 'sequence_start':
+            self.sequence = message.get('sequence')
+            self.n_onsets = 0
+            return f"Sequence {self.sequence} started ({message.get('n_images')} images)"
+        
+        if kind == 'onset':
+            self.n_onsets += 1
+            return None
+        
+        if kind == 'response':
+            self.reaction_times.append(message['reaction_time'])
+            if message.get('correct'):
+                self.n_correct += 1
+            return (f"Response at image {message.get('image_position')}, "
+                    f"RT={message['reaction_time']:.3f}s | {self.status()}")
+        
+        if kind == 'dropped_frames':
+            self.dropped_frames += message.get('dropped_frames', 0)
+            return (f"Sequence {message.get('sequence')}: {message.get('dropped_frames')} dropped frames, "
+                    f"{message.get('missed_deadlines')} missed deadlines")
+        
+        if kind == 'pulse_error':
+            self.pulse_errors += 1
+            return f"Pulse error: code {message.get('value')} was not sent"
+        
+        if kind == 'sequence_end':
+            return (f"Sequence {message.get('sequence')} completed: {self.n_onsets} onsets, "
+                    f"{message.get('n_responses')} responses | {self.status()}")
+        
+        return None
+    
+    def status(self):
+        """Live accuracy, RT statistics and error counts"""
+        n_responses = len(self.reaction_times)
+        if n_responses == 0:
+            return "no responses yet"
+        
+        rts = np.array(self.reaction_times)
+        return (f"responses {n_responses}, accuracy {100.0 * self.n_correct / n_responses:.1f}%, "
+                f"RT mean {rts.mean():.3f}s median {np.median(rts):.3f}s sd {rts.std():.3f}s, "
+                f"dropped frames {self.dropped_frames}, pulse errors {self.pulse_errors}")
+    
+    def run(self):
+        """Receive and print telemetry until Ctrl+C"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(self.address)
+        print(f"Listening for telemetry on UDP {self.address[0]}:{self.address[1]} (Ctrl+C to stop)")
+        
+        try:
+            while True:
+                data = sock.recv(65536)
+                try:
+                    message = json.loads(data.decode('utf-8'))
+                except ValueError:
+                    continue
+                line = self.handle(message)
+                if line:
+                    print(line)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            print(f"Final: {self.status()}")
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TELEMETRY_PORT
+    TelemetryConsole(port=port).run()
@@ -0,0 +1,417 @@
+"""
+RSVP Timing Module
+==================
+
+This module provides frame-based presentation timing for the RSVP experiment:
+- One session clock (monotonic timebase with a wall-clock anchor) for flips,
+  inputs, pulses and records
+- Conversion of stimulus durations into whole numbers of frames
+- Presentation by counting vsyncs (one flip per frame), with input polling between flips
+- Planned versus achieved duration of every stimulus
+- Flip-to-pulse delay of flip-locked trigger pulses
+- Per-sequence frame interval log with dropped-frame and missed-deadline detection
+- Sequences precompiled into timelines (NumPy structured arrays of events)
+- Checks that durations are whole numbers of frames (fast RSVP)
+
+Dependencies:
+- numpy
+- psychopy
+"""
+
+import time
+from datetime import datetime
+import numpy as np
+
+# psychopy.core is imported on first use, so timelines compile without PsychoPy
+core = None
+
+def load_core():
+    """Import psychopy.core (raises ImportError if PsychoPy is not installed)"""
+    global core
+    if core is None:
+        from psychopy import core
+    return core
+
+class SessionClock:
+    """Monotonic timebase shared by every subsystem of a session
+    
+    Times are seconds on PsychoPy's monotonic clock (core.monotonicClock),
+    the clock window.flip() timestamps come from, so flips, key presses,
+    gamepad edges and pulses can be compared directly. A wall-clock anchor,
+    taken once per session, converts them to dates for the records (or on
+    first use if the session never took it).
+    """
+    
+    def __init__(self):
+        self.anchor_time = None
+        self.anchor_wall = None
+    
+    @property
+    def monotonic(self):
+        """PsychoPy's monotonic clock"""
+        return load_core().monotonicClock
+    
+    def anchor(self):
+        """Take the wall-clock anchor (once, at the start of a session)"""
+        self.anchor_time = self.now()
+        self.anchor_wall = time.time()
+    
+    def now(self):
+        """Current time (seconds, sub-millisecond resolution)"""
+        return self.monotonic.getTime()
+    
+    def wall_time(self, t):
+        """Session time to Unix time"""
+        if self.anchor_time is None:
+            self.anchor()
+        return self.anchor_wall + (t - self.anchor_time)
+    
+    def isoformat(self, t=None):
+        """Session time (default: now) as an ISO 8601 date"""
+        return datetime.fromtimestamp(self.wall_time(self.now() if t is None else t)).isoformat()
+    
+    def wait_until(self, target_time):
+        """Sleep until target_time without holding the GIL
+        
+        Sleeps until 2 ms before the target; the last 2 ms are spent
+        yielding (time.sleep(0)) rather than spinning, so the render thread
+        keeps running.
+        """
+        remaining = target_time - self.now()
+        if remaining > 0.002:
+            time.sleep(remaining - 0.002)
+        while self.now() < target_time:
+            time.sleep(0)
+    
+    def info(self):
+        """Anchor of the session, saved with the data"""
+        if self.anchor_time is None:
+            self.anchor()
+        return {
+            'clock': 'psychopy.core.monotonicClock',
+            'anchor_time': self.anchor_time,
+            'anchor_wall': self.anchor_wall,
+            'anchor_iso': datetime.fromtimestamp(self.anchor_wall).isoformat()
+        }
+
+# The clock every module of the experiment uses
+session_clock = SessionClock()
+
+# Event types of a compiled timeline
+EVENT_BLANK = 0
+EVENT_IMAGE = 1
+EVENT_LINES_ON = 2      # lines appear during the first blank
+EVENT_LINES_CHANGE = 3  # lines change color while an image is shown
+EVENT_LINES_OFF = 4     # lines disappear during the final blank
+
+# One row per event: what is shown, from which frame, for how long, and its pulse code
+TIMELINE_DTYPE = np.dtype([
+    ('event_type', 'i1'),
+    ('position', 'i4'),      # position in the sequence (-1 for blanks)
+    ('stim_id', 'i4'),       # image index (-1 for blanks)
+    ('lines', 'i1'),         # line color state (-1 without lines)
+    ('onset_frame', 'i4'),   # frames from the first flip of the sequence
+    ('n_frames', 'i4'),
+    ('target_onset', 'f8'),  # seconds from the first flip of the sequence
+    ('pulse_code', 'i2')
+])
+
+def frames_for(duration, ifi):
+    """Number of frames closest to a duration (at least one)"""
+    return max(1, int(round(duration / ifi)))
+
+def frame_multiple_errors(durations, ifi, tolerance=0.01):
+    """Durations that are not a whole number (at least one) of frames, as (duration, frames)"""
+    frames = np.asarray(durations, dtype=float) / ifi
+    bad = (np.abs(frames - np.round(frames)) > tolerance) | (np.round(frames) < 1)
+    return [(float(duration), float(n)) for duration, n in zip(np.asarray(durations)[bad], frames[bad])]
+
+def frame_count_mismatches(durations, nominal_ifi, measured_ifi):
+    """Durations shown as another number of frames at the measured than at the nominal
+    frame interval, as (duration, nominal frames, measured frames)"""
+    return [(float(duration), frames_for(duration, nominal_ifi), frames_for(duration, measured_ifi))
+            for duration in durations if frames_for(duration, nominal_ifi) != frames_for(duration, measured_ifi)]
+
+def split_frames(total_frames, duration, ifi):
+    """Frames before a change `duration` into an event (at least one on each side)"""
+    return min(max(1, frames_for(duration, ifi)), total_frames - 1)
+
+def compile_sequence_timeline(sequence_info, ifi, pulse_codes):
+    """Compile a trial_structure entry into a timeline of events
+    
+    The sequence is a blank, the images and a final blank. Images last
+    sequence_info['isi'], or their own entry of sequence_info['isis']
+    (mixed ISIs within the sequence). Image pulse codes
+    alternate between pic_onoff_1 and pic_onoff_2 (the first image uses
+    pic_onoff_2), blanks use blank_on.
+    
+    With the lines task (sequence_info['lines']) the lines appear part-way
+    through the first blank (lines_onoff), change color part-way through
+    some images (lines_flip_pic) and disappear part-way through the final
+    blank (lines_onoff). A change needs at least two frames of image: on a
+    shorter image it moves to the next image long enough to show it, and is
+    dropped (with its color) if there is none. Every color change is a
+    change event with its pulse.
+    """
+    image_indices = sequence_info['image_indices']
+    blank_frames = frames_for(sequence_info['blank_duration'], ifi)
+    isis = sequence_info.get('isis') or [sequence_info['isi']] * len(image_indices)
+    lines = sequence_info.get('lines')
+    state = lines['start_state'] if lines else -1
+    changes = {change['position']: change for change in lines['changes']} if lines else {}
+    
+    # (event type, position, stimulus id, line state, frames, pulse code)
+    events = []
+    
+    if lines:
+        on_frames = split_frames(blank_frames, lines['lines_on'], ifi)
+        events.append((EVENT_BLANK, -1, -1, -1, on_frames, pulse_codes['blank_on']))
+        events.append((EVENT_LINES_ON, -1, -1, state, blank_frames - on_frames, pulse_codes['lines_onoff']))
+    else:
+        events.append((EVENT_BLANK, -1, -1, -1, blank_frames, pulse_codes['blank_on']))
+    
+    deferred = None  # Change waiting for an image of at least two frames
+    for position, stim_id in enumerate(image_indices):
+        image_frames = frames_for(isis[position], ifi)
+        if position > 0 and position % 2 == 0:
+            image_code = pulse_codes['pic_onoff_1'][0]
+        else:
+            image_code = pulse_codes['pic_onoff_2'][0]
+        
+        # The image's own change replaces a deferred one; a change to the
+        # color already shown is no change
+        change = changes.get(position, deferred)
+        deferred = change if change is not None and image_frames < 2 else None
+        if change is None or deferred is not None or change['state'] == state:
+            events.append((EVENT_IMAGE, position, stim_id, state, image_frames, image_code))
+        else:
+            change_frames = split_frames(image_frames, change['time'], ifi)
+            events.append((EVENT_IMAGE, position, stim_id, state, change_frames, image_code))
+            events.append((EVENT_LINES_CHANGE, position, stim_id, change['state'],
+                           image_frames - change_frames, pulse_codes['lines_flip_pic']))
+            state = change['state']
+    
+    if lines:
+        off_frames = split_frames(blank_frames, lines['lines_off'], ifi)
+        events.append((EVENT_BLANK, -1, -1, state, off_frames, pulse_codes['blank_on']))
+        events.append((EVENT_LINES_OFF, -1, -1, -1, blank_frames - off_frames, pulse_codes['lines_onoff']))
+    else:
+        events.append((EVENT_BLANK, -1, -1, -1, blank_frames, pulse_codes['blank_on']))
+    
+    timeline = np.zeros(len(events), dtype=TIMELINE_DTYPE)
+    for name, column in zip(('event_type', 'position', 'stim_id', 'lines', 'n_frames', 'pulse_code'),
+                            zip(*events)):
+        timeline[name] = column
+    
+    timeline['onset_frame'][1:] = np.cumsum(timeline['n_frames'])[:-1]
+    timeline['target_onset'] = timeline['onset_frame'] * ifi
+    
+    return timeline
+
+def event_texture_key(stim_id, lines):
+    """Texture key of a timeline event (None for a plain blank), see TextureManager"""
+    if lines >= 0:
+        return (stim_id, lines)
+    return stim_id if stim_id >= 0 else None
+
+def event_label(event_type, position):
+    """Label of a timeline event in the timing reports"""
+    if event_type == EVENT_IMAGE:
+        return f"image {position + 1}"
+    if event_type == EVENT_LINES_CHANGE:
+        return f"change {position + 1}"
+    if event_type == EVENT_LINES_ON:
+        return 'lines on'
+    if event_type == EVENT_LINES_OFF:
+        return 'lines off'
+    return 'blank'
+
+class FrameScheduler:
+    """Present stimuli for a whole number of frames by counting vsyncs"""
+    
+    def __init__(self, window, ifi):
+        self.window = window
+        self.ifi = ifi
+        self.records = []
+        self.last_flip_time = None  # Return value of the latest flip (session clock)
+    
+    def frames_for(self, duration):
+        """Number of frames closest to a duration (at least one)"""
+        return frames_for(duration, self.ifi)
+    
+    def start_sequence(self):
+        """Clear the per-stimulus records before a new sequence"""
+        self.records = []
+    
+    def present(self, draw, duration, label, poll=None, on_onset=None, on_flip=None):
+        """Show a stimulus for frames_for(duration) frames
+
+        draw is called before every flip (None leaves the screen blank),
+        on_flip() runs inside the first flip right after the buffer swap
+        (window.callOnFlip), on_onset(onset_time) runs once the first flip
+        returned and poll() runs between flips (last_flip_time is the
+        time of the flip that just returned). Returns False as soon as
+        poll() returns False.
+        """
+        return self.present_frames(draw, self.frames_for(duration), label, poll, on_onset, on_flip)
+    
+    def present_frames(self, draw, n_frames, label, poll=None, on_onset=None, on_flip=None):
+        """Show a stimulus for n_frames frames (see present)"""
+        for frame in range(n_frames):
+            if draw:
+                draw()
+            if frame == 0 and on_flip:
+                self.window.callOnFlip(on_flip)
+            flip_time = self.window.flip()
+            self.last_flip_time = flip_time
+            
+            if frame == 0:
+                self._close_previous(flip_time)
+                self.records.append({
+                    'label': label,
+                    'planned_frames': n_frames,
+                    'planned_duration': n_frames * self.ifi,
+                    'onset': flip_time,
+                    'achieved_duration': None
+                })
+                if on_onset:
+                    on_onset(flip_time)
+            
+            if poll and poll() is False:
+                return False
+        
+        return True
+    
+    def finish(self):
+        """Flip once more to timestamp the end of the last stimulus"""
+        end_time = self.window.flip()
+        self.last_flip_time = end_time
+        self._close_previous(end_time)
+        return end_time
+    
+    def _close_previous(self, onset_time):
+        """The previous stimulus lasted until this onset"""
+        if self.records and self.records[-1]['achieved_duration'] is None:
+            self.records[-1]['achieved_duration'] = onset_time - self.records[-1]['onset']
+    
+    def report(self):
+        """Planned versus achieved duration of every stimulus of the sequence"""
+        report = []
+        
+        for record in self.records:
+            achieved = record['achieved_duration']
+            report.append({
+                'label': record['label'],
+                'onset': record['onset'],
+                'planned_frames': record['planned_frames'],
+                'planned_duration': record['planned_duration'],
+                'achieved_duration': achieved,
+                'achieved_frames': None if achieved is None else int(round(achieved / self.ifi)),
+                'error': None if achieved is None else achieved - record['planned_duration']
+            })
+        
+        return report
+
+class FrameTimingLog:
+    """Per-sequence frame interval recording with dropped-frame detection
+    
+    Frame intervals come from window.recordFrameIntervals and are kept as
+    NumPy arrays, one per sequence. A frame is dropped when its interval
+    exceeds drop_threshold frame periods; a stimulus missed its deadline
+    when its onset came half a frame or more after its planned onset.
+    """
+    
+    def __init__(self, window, ifi, drop_threshold=1.5):
+        self.window = window
+        self.ifi = ifi
+        self.drop_threshold = drop_threshold
+        self.intervals = {}
+        self.summaries = []
+    
+    def start_sequence(self):
+        """Start recording frame intervals"""
+        self.window.frameIntervals = []
+        self.window.recordFrameIntervals = True
+    
+    def end_sequence(self, sequence_number, timing_report):
+        """Stop recording and summarize the sequence (timing_report from FrameScheduler)"""
+        self.window.recordFrameIntervals = False
+        intervals = np.asarray(self.window.frameIntervals, dtype=float)
+        self.intervals[sequence_number] = intervals
+        
+        # Dropped frames: intervals well above one frame period
+        dropped = np.flatnonzero(intervals > self.drop_threshold * self.ifi)
+        
+        # Missed deadlines: onset later than the first onset plus the planned durations before it
+        onsets = np.array([row['onset'] for row in timing_report])
+        planned = np.array([row['planned_duration'] for row in timing_report])
+        lateness = np.zeros(0)
+        if onsets.size:
+            planned_onsets = onsets[0] + np.concatenate(([0.0], np.cumsum(planned)[:-1]))
+            lateness = onsets - planned_onsets
+        missed = np.flatnonzero(lateness >= 0.5 * self.ifi)
+        
+        # ISI error: |achieved - planned| duration of the images (None without images)
+        isi_error = np.array([abs(row['error']) for row in timing_report
+                              if row['error'] is not None and row['label'].startswith('image')])
+        has_images = isi_error.size > 0
+        
+        summary = {
+            'sequence_number': sequence_number,
+            'n_frames': int(intervals.size),
+            'mean_interval': float(intervals.mean()) if intervals.size else None,
+            'dropped_frames': int(dropped.size),
+            'dropped_frame_indices': dropped.tolist(),
+            'missed_deadlines': int(missed.size),
+            'missed_stimuli': [timing_report[i]['label'] for i in missed],
+            'max_lateness': float(lateness.max()) if lateness.size else 0.0,
+            'isi_error_p50': float(np.percentile(isi_error, 50)) if has_images else None,
+            'isi_error_p95': float(np.percentile(isi_error, 95)) if has_images else None,
+            'isi_error_p99': float(np.percentile(isi_error, 99)) if has_images else None,
+            'isi_error_max': float(isi_error.max()) if has_images else None
+        }
+        self.summaries.append(summary)
+        return summary
+    
+    def save(self, filename):
+        """Save the frame intervals of every sequence as a .npz file"""
+        np.savez(filename, **{f"sequence_{number}": intervals for number, intervals in self.intervals.items()})
+
+def print_frame_summary(summary):
+    """Print the frame timing summary of a sequence"""
+    mean_interval = summary['mean_interval'] or 0.0
+    print(f"  Frames: {summary['n_frames']} (mean interval {mean_interval*1000:.2f} ms), "
+          f"dropped: {summary['dropped_frames']}, missed deadlines: {summary['missed_deadlines']}")
+    if summary['isi_error_max'] is None:
+        print("  ISI error: no images presented")
+        return
+    print(f"  ISI error p50/p95/p99/max: {summary['isi_error_p50']*1000:.2f} / "
+          f"{summary['isi_error_p95']*1000:.2f} / {summary['isi_error_p99']*1000:.2f} / "
+          f"{summary['isi_error_max']*1000:.2f} ms")
+
+def print_timing_report(report):
+    """Print the planned versus achieved durations of a sequence"""
+    print(f"  {'stimulus':<12} {'planned':>14} {'achieved':>14} {'error':>9}")
+    
+    for row in report:
+        if row['achieved_duration'] is None:
+            continue
+        print(f"  {row['label']:<12} "
+              f"{row['planned_duration']*1000:7.1f} ms ({row['planned_frames']:3d}) "
+              f"{row['achieved_duration']*1000:7.1f} ms ({row['achieved_frames']:3d}) "
+              f"{row['error']*1000:+6.1f} ms")
+    
+    errors = np.array([row['error'] for row in report if row['error'] is not None])
+    if errors.size:
+        off = sum(1 for row in report
+                  if row['achieved_frames'] is not None and row['achieved_frames'] != row['planned_frames'])
+        print(f"  Max |error|: {np.abs(errors).max()*1000:.1f} ms, stimuli off by a frame or more: {off}")
+
+def print_flip_pulse_delays(flip_pulses):
+    """Print the flip-to-pulse delay of flip-locked pulses"""
+    delays = np.array([pulse['delay'] for pulse in flip_pulses if pulse['delay'] is not None])
+    if delays.size == 0:
+        return
+    
+    print(f"  Flip-to-pulse delay ({delays.size} events): mean {delays.mean()*1000:.2f} ms, "
+          f"max {delays.max()*1000:.2f} ms")
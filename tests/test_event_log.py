@@ -0,0 +1,28 @@
+import json
+
+from rsvp_data import EventLog, read_event_log, index_path
+
+def test_finalize_indexes_records(tmp_path):
+    path = str(tmp_path / 'session_events.jsonl')
+    log = EventLog(path, fsync_interval=0.01)
+    log.start()
+    log.write('sequence_start', sequence=1)
+    log.write('response', sequence=1, rt=0.4)
+    index = log.finalize()
+    
+    assert index['n_records'] == 2
+    assert index['complete']
+    assert index['counts'] == {'sequence_start': 1, 'response': 1}
+    assert [record['type'] for record in read_event_log(path)] == ['sequence_start', 'response']
+
+def test_session_ended_by_error_is_incomplete(tmp_path):
+    path = str(tmp_path / 'session_events.jsonl')
+    log = EventLog(path, fsync_interval=0.01)
+    log.start()
+    log.write('sequence_start', sequence=1)
+    log.finalize(complete=False)
+    
+    with open(index_path(path)) as f:
+        index = json.load(f)
+    assert index['n_records'] == 1
+    assert not index['complete']
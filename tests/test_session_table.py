@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from rsvp_data import write_session_table, load_session, SESSION_TABLES
+
+# The timeline columns the events table takes from a compiled sequence
+TIMELINE = np.array([(0, -1, -1, 69), (1, 1, 0, 3), (3, 1, 2, 133), (0, -1, 2, 69)],
+                    dtype=[('event_type', 'i1'), ('stim_id', 'i4'), ('lines', 'i1'), ('pulse_code', 'i2')])
+
+def stimulus(label, onset, frames, achieved_frames):
+    return {'label': label, 'onset': onset, 'planned_frames': frames, 'planned_duration': frames / 60,
+            'achieved_frames': achieved_frames, 'achieved_duration': achieved_frames / 60,
+            'error': (achieved_frames - frames) / 60}
+
+def write(path, **tables):
+    arguments = {
+        'metadata': {'participant': 'P01', 'config': {'isi': [0.1]}},
+        'sequence_timing': [],
+        'timelines': {},
+        'image_names': ['a.png', 'b.png'],
+        'responses': [],
+        'pulses': [],
+        'flip_pulses': [],
+        'frame_intervals': {}
+    }
+    arguments.update(tables)
+    return write_session_table(str(path), **arguments)
+
+def test_session_round_trip(tmp_path):
+    path = tmp_path / 'session.parquet'
+    sequence_timing = [{'sequence_number': 1, 'stimuli': [
+        stimulus('blank', 10.0, 60, 60), stimulus('image 1', 11.0, 3, 3),
+        stimulus('change 1', 11.05, 3, 4), stimulus('blank', 11.1167, 60, 60)
+    ]}]
+    responses = [{'sequence_number': 1, 'image_position': 0, 'reaction_time': 0.42, 'correct': True,
+                  'response_time': 11.47, 'timestamp': '2026-01-05T10:00:11.470000'}]
+    pulses = [{'value': 3, 'queued': 11.0, 'scheduled': 11.0, 'on': 11.0004, 'off': 11.0404, 'latency': 0.0004}]
+    flip_pulses = [{'event': 'change 1', 'value': 133, 'on': 11.0502, 'off': None, 'flip_time': 11.05,
+                    'delay': 0.0002}]
+    intervals = np.full(126, 1 / 60)
+    
+    rows = write(path, sequence_timing=sequence_timing, timelines={1: TIMELINE}, responses=responses,
+                 pulses=pulses, flip_pulses=flip_pulses, frame_intervals={1: intervals})
+    assert rows == 4 + 1 + 2 + 126
+    
+    session = load_session(str(path))
+    assert session['metadata'] == {'participant': 'P01', 'config': {'isi': [0.1]}}
+    for name, columns in SESSION_TABLES.items():
+        assert list(session[name].columns) == columns
+    
+    events = session['events']
+    assert events['event_type'].tolist() == [0, 1, 3, 0]
+    assert str(events['event_type'].dtype) == 'Int8'
+    assert events['image_name'].tolist()[1:3] == ['b.png', 'b.png']
+    assert events['image_name'].isna().tolist() == [True, False, False, True]
+    assert events['achieved_frames'].tolist() == [60, 3, 4, 60]
+    
+    response = session['responses'].iloc[0]
+    assert response['reaction_time'] == 0.42 and bool(response['correct'])
+    assert str(session['responses']['correct'].dtype) == 'boolean'
+    
+    pulses = session['pulses']
+    assert pulses['label'].tolist() == ['worker', 'change 1']
+    assert pulses['value'].tolist() == [3, 133]
+    assert np.isnan(pulses['off'].iloc[1])
+    
+    assert np.allclose(session['frame_intervals']['interval'], intervals)
+
+def test_empty_session(tmp_path):
+    path = tmp_path / 'aborted.parquet'
+    assert write(path) == 0
+    
+    session = load_session(str(path))
+    for name in SESSION_TABLES:
+        assert len(session[name]) == 0
@@ -0,0 +1,62 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from rsvp_data import P2Quantile, OnlineStats, ResponseStats
+
+def test_p2_quantile_exact_up_to_five():
+    estimate = P2Quantile(0.5)
+    assert estimate.value() is None
+    
+    values = [0.4, 0.1, 0.3, 0.5, 0.2]
+    for n in range(1, 6):
+        estimate.update(values[n - 1])
+        assert estimate.value() == pytest.approx(np.percentile(values[:n], 50))
+
+@pytest.mark.parametrize('p', [0.5, 0.9])
+def test_p2_quantile_tracks_large_samples(p):
+    rng = random.Random(1)
+    values = [rng.lognormvariate(-1.0, 0.3) for _ in range(5000)]
+    estimate = P2Quantile(p)
+    for value in values:
+        estimate.update(value)
+    
+    assert estimate.value() == pytest.approx(np.percentile(values, p * 100), rel=0.02)
+
+def test_online_stats_matches_numpy():
+    rng = random.Random(2)
+    values = [rng.gauss(0.45, 0.08) for _ in range(1000)]
+    stats = OnlineStats()
+    for value in values:
+        stats.update(value)
+    
+    assert stats.n == len(values)
+    assert stats.mean == pytest.approx(np.mean(values))
+    assert stats.std == pytest.approx(np.std(values, ddof=1))
+    assert stats.min == min(values) and stats.max == max(values)
+    assert stats.median == pytest.approx(np.median(values), rel=0.02)
+
+def test_online_stats_few_observations():
+    stats = OnlineStats()
+    assert stats.median is None and stats.std is None
+    
+    stats.update(0.3)
+    assert stats.mean == 0.3 and stats.median == 0.3
+    assert stats.variance is None
+
+def test_response_stats_summary():
+    stats = ResponseStats()
+    assert stats.summary() == {}
+    
+    stats.update(0.40, True)
+    stats.update(0.60, True)
+    stats.update(0.50, False)
+    summary = stats.summary()
+    
+    assert (summary['total_responses'], summary['correct_responses']) == (3, 2)
+    assert summary['accuracy'] == pytest.approx(2 / 3 * 100)
+    assert summary['mean_reaction_time'] == pytest.approx(0.5)
+    assert summary['median_reaction_time'] == pytest.approx(0.5)
+    assert summary['std_reaction_time'] == pytest.approx(math.sqrt(0.01))
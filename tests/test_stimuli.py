@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from rsvp_stimuli import (pack_stimulus_bundle, is_stimulus_bundle, StimulusBundle, decode_image,
+                          StimulusCache, BUNDLE_ALIGNMENT)
+
+MAX_SIZE = (64, 48)
+
+@pytest.fixture
+def pictures(tmp_path):
+    """Small PNG images of odd sizes (one is scaled down to fit MAX_SIZE)"""
+    rng = np.random.default_rng(0)
+    directory = tmp_path / 'pictures'
+    directory.mkdir()
+    for name, (width, height) in [('a.png', (33, 17)), ('b.png', (128, 40)), ('c.png', (5, 48))]:
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        Image.fromarray(pixels, 'RGB').save(directory / name)
+    (directory / '._a.png').write_bytes(b'resource fork')
+    return directory
+
+def test_bundle_round_trip(pictures, tmp_path):
+    bundle_path = tmp_path / 'stimuli.bundle'
+    assert pack_stimulus_bundle(str(pictures), str(bundle_path), MAX_SIZE, workers=2) == 3
+    assert is_stimulus_bundle(str(bundle_path))
+    assert not is_stimulus_bundle(str(pictures))
+    
+    bundle = StimulusBundle(str(bundle_path))
+    assert len(bundle) == 3
+    assert bundle.max_size == MAX_SIZE
+    
+    records = bundle.records()
+    assert [record['name'] for record in records] == ['a.png', 'b.png', 'c.png']
+    for record in records:
+        expected = decode_image(str(pictures / record['name']), MAX_SIZE)['pixels']
+        assert record['pixels'].shape == expected.shape
+        assert np.array_equal(record['pixels'], expected)
+        assert record['source'] == 'bundle'
+    
+    # Zero-copy views into the mapped file, every block aligned
+    assert all(np.shares_memory(record['pixels'], bundle.data) for record in records)
+    assert all((bundle.data_offset + entry['offset']) % BUNDLE_ALIGNMENT == 0 for entry in bundle.index)
+    assert records[1]['pixels'].shape == (20, 64, 4)
+
+def test_not_a_bundle(tmp_path):
+    path = tmp_path / 'image.png'
+    Image.new('RGB', (4, 4)).save(path)
+    
+    assert not is_stimulus_bundle(str(path))
+    with pytest.raises(ValueError):
+        StimulusBundle(str(path))
+
+def test_cache_shared_content_and_eviction(pictures, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    copy = tmp_path / 'copy.png'
+    copy.write_bytes((pictures / 'a.png').read_bytes())
+    
+    cache = StimulusCache(cache_dir=cache_dir, max_bytes=0)
+    key = cache.make_key(str(pictures / 'a.png'), MAX_SIZE)
+    assert cache.make_key(str(copy), MAX_SIZE) == key
+    pixels = decode_image(str(pictures / 'a.png'), MAX_SIZE)['pixels']
+    cache.put(key, pixels, str(pictures / 'a.png'))
+    cache.put(key, pixels, str(copy))
+    assert len(cache.index['entries'][key]['sources']) == 2
+    
+    # Over the cap, but used by this load: kept
+    cache.save()
+    assert cache.get(key) is not None
+    
+    # Changing one file leaves the entry to the other
+    Image.new('RGB', (8, 8)).save(copy)
+    new_key = cache.make_key(str(copy), MAX_SIZE)
+    cache.put(new_key, decode_image(str(copy), MAX_SIZE)['pixels'], str(copy))
+    assert cache.index['entries'][key]['sources'] == [str(pictures / 'a.png')]
+    cache.save()
+    
+    # A later load evicts what it did not use
+    later = StimulusCache(cache_dir=cache_dir, max_bytes=0)
+    assert later.get(new_key) is not None
+    assert later.evict() == 1
+    assert set(later.index['entries']) == {new_key}
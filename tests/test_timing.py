@@ -0,0 +1,117 @@
+import numpy as np
+
+from rsvp_timing import (compile_sequence_timeline, FrameTimingLog, print_frame_summary, EVENT_BLANK,
+                         EVENT_IMAGE, EVENT_LINES_ON, EVENT_LINES_CHANGE, EVENT_LINES_OFF)
+
+# Same codes as rsvp_hardware.PULSE_CODES (rsvp_hardware needs PsychoPy)
+PULSE_CODES = {
+    'pic_onoff_1': [1, 5, 17],
+    'pic_onoff_2': [3, 9, 33],
+    'blank_on': 69,
+    'lines_onoff': 77,
+    'lines_flip_pic': 133,
+    'lines_flip_blank': 103
+}
+
+IFI = 1.0 / 60
+
+def sequence(**fields):
+    info = {'image_indices': [4, 7, 2, 9], 'isi': 0.1, 'blank_duration': 1.0}
+    info.update(fields)
+    return info
+
+def test_frame_counts_and_onsets():
+    timeline = compile_sequence_timeline(sequence(), IFI, PULSE_CODES)
+    
+    assert timeline['event_type'].tolist() == [EVENT_BLANK] + [EVENT_IMAGE] * 4 + [EVENT_BLANK]
+    assert timeline['n_frames'].tolist() == [60, 6, 6, 6, 6, 60]
+    assert timeline['onset_frame'].tolist() == [0, 60, 66, 72, 78, 84]
+    assert np.allclose(timeline['target_onset'], timeline['onset_frame'] * IFI)
+    assert timeline['stim_id'].tolist() == [-1, 4, 7, 2, 9, -1]
+    assert timeline['position'].tolist() == [-1, 0, 1, 2, 3, -1]
+
+def test_mixed_isis_round_to_frames():
+    timeline = compile_sequence_timeline(sequence(isis=[0.05, 0.1, 0.2, 0.118]), IFI, PULSE_CODES)
+    
+    assert timeline['n_frames'][1:-1].tolist() == [3, 6, 12, 7]
+
+def test_image_pulse_codes_alternate():
+    timeline = compile_sequence_timeline(sequence(image_indices=[0, 1, 2, 3, 4]), IFI, PULSE_CODES)
+    pic_1, pic_2 = PULSE_CODES['pic_onoff_1'][0], PULSE_CODES['pic_onoff_2'][0]
+    
+    # The first image uses pic_onoff_2, then the codes alternate
+    assert timeline['pulse_code'][1:-1].tolist() == [pic_2, pic_2, pic_1, pic_2, pic_1]
+    assert timeline['pulse_code'][[0, -1]].tolist() == [PULSE_CODES['blank_on']] * 2
+
+def test_line_events():
+    lines = {
+        'start_state': 0,
+        'lines_on': 0.5,
+        'lines_off': 0.7,
+        'changes': [{'position': 1, 'time': 0.05, 'state': 2}, {'position': 3, 'time': 0.025, 'state': 1}]
+    }
+    timeline = compile_sequence_timeline(sequence(lines=lines), IFI, PULSE_CODES)
+    
+    assert timeline['event_type'].tolist() == [
+        EVENT_BLANK, EVENT_LINES_ON,
+        EVENT_IMAGE, EVENT_IMAGE, EVENT_LINES_CHANGE, EVENT_IMAGE, EVENT_IMAGE, EVENT_LINES_CHANGE,
+        EVENT_BLANK, EVENT_LINES_OFF
+    ]
+    assert timeline['n_frames'].tolist() == [30, 30, 6, 3, 3, 6, 2, 4, 42, 18]
+    assert timeline['lines'].tolist() == [-1, 0, 0, 0, 2, 2, 2, 1, 1, -1]
+    
+    # A change splits its image: same image, new line state, lines_flip_pic code
+    assert timeline['position'][3:5].tolist() == [1, 1]
+    assert timeline['stim_id'][3:5].tolist() == [7, 7]
+    assert timeline['pulse_code'][[1, 4, 7, 9]].tolist() == [
+        PULSE_CODES['lines_onoff'], PULSE_CODES['lines_flip_pic'],
+        PULSE_CODES['lines_flip_pic'], PULSE_CODES['lines_onoff']
+    ]
+    assert timeline['n_frames'].sum() == 60 + 4 * 6 + 60
+
+def test_change_moves_to_an_image_of_two_frames():
+    lines = {'start_state': 0, 'lines_on': 0.5, 'lines_off': 0.5,
+             'changes': [{'position': 1, 'time': 0.01, 'state': 1}]}
+    timeline = compile_sequence_timeline(sequence(isis=[IFI, IFI, 0.05, IFI], lines=lines), IFI, PULSE_CODES)
+    
+    # One-frame image 1: the change (and its pulse) comes on image 2
+    changes = timeline[timeline['event_type'] == EVENT_LINES_CHANGE]
+    assert changes['position'].tolist() == [2]
+    assert changes['pulse_code'].tolist() == [PULSE_CODES['lines_flip_pic']]
+    assert timeline['lines'][2:7].tolist() == [0, 0, 0, 1, 1]
+
+def test_change_without_an_image_of_two_frames_is_dropped():
+    lines = {'start_state': 0, 'lines_on': 0.5, 'lines_off': 0.5,
+             'changes': [{'position': 2, 'time': 0.01, 'state': 1}]}
+    timeline = compile_sequence_timeline(sequence(isis=[IFI] * 4, lines=lines), IFI, PULSE_CODES)
+    
+    # No color change at all rather than a change without its event
+    assert EVENT_LINES_CHANGE not in timeline['event_type'].tolist()
+    assert set(timeline['lines'][1:-1].tolist()) == {0}
+
+class Window:
+    """Stand-in for a PsychoPy window that recorded frame intervals"""
+    recordFrameIntervals = True
+    
+    def __init__(self, intervals):
+        self.frameIntervals = intervals
+
+def stimulus(label, onset, planned, error):
+    return {'label': label, 'onset': onset, 'planned_duration': planned, 'error': error}
+
+def test_isi_error_percentiles():
+    frame_log = FrameTimingLog(Window([IFI] * 12), IFI)
+    report = [stimulus('blank', 0.0, 0.1, 0.0), stimulus('image 1', 0.1, 0.1, IFI),
+              stimulus('image 2', 0.2 + IFI, 0.1, 0.0)]
+    summary = frame_log.end_sequence(1, report)
+    
+    assert summary['isi_error_max'] == IFI
+    assert summary['missed_deadlines'] == 1
+
+def test_isi_error_without_images():
+    frame_log = FrameTimingLog(Window([IFI] * 6), IFI)
+    summary = frame_log.end_sequence(1, [stimulus('blank', 0.0, 0.1, 0.0)])
+    
+    assert summary['isi_error_p50'] is None
+    assert summary['isi_error_max'] is None
+    print_frame_summary(summary)